@@ -14,6 +14,10 @@ class LightStrip(Light):
     using a single output pin. So you do not send it composite lights, but just the pin
     it is connected to. It is a composite light because it has multiple lights, but
     they cannot technically be controlled individually.
+
+    Colors are written straight into the NeoPixel byte buffer through a
+    256 entry brightness table, which is only rebuilt when the brightness
+    changes - so setting a pixel does no arithmetic and allocates nothing.
     """
 
     FILLS = 0
@@ -31,11 +35,17 @@ class LightStrip(Light):
         self._name = name
         self._pin = pin
         self._numleds = numleds
-        self._brightness = brightness
         self._running = False
         
         Log.i(f'Creating a neopixel {name} on pin {pin} with {numleds} LEDs')
         self._np = neopixel.NeoPixel(machine.Pin(pin), numleds)
+        self._buf = self._np.buf            # bpp bytes per pixel, in the strip's color order
+        self._bpp = self._np.bpp
+        self._order = self._np.ORDER
+        self._pixel = bytearray(self._bpp)  # one pixel in wire order, for fills
+        self._lut = bytearray(256)          # color value -> brightness-scaled value
+        self._wheel = None                  # the rainbow, scaled and in wire order - built when first needed
+        self._setLut(brightness)
 
     def on(self):
         """ Turn all LEDs ON - all white """
@@ -56,8 +66,9 @@ class LightStrip(Light):
     def flip(self):
         """ Flip the clors on all the LEDs """
         
-        for x in range(0, self._numleds):
-            self._np[x] = (255-self._np[x][0], 255-self._np[x][1], 255-self._np[x][2])
+        buf = self._buf
+        for x in range(len(buf)):
+            buf[x] = 255 - buf[x]
         self.show()
         Log.i(f'{self._name} flipped')
 
@@ -75,16 +86,12 @@ class LightStrip(Light):
             numPixels = self._numleds
             
         if numPixels >= 0:
-            for i in range(numPixels):
-                self._set_pixel(i, color)
-            for i in range(numPixels,self._numleds):
-                self._set_pixel(i, BLACK)
+            self._fillRange(0, numPixels, color)
+            self._fillRange(numPixels, self._numleds, BLACK)
         else:
             np = abs(numPixels)
-            for i in range(self._numleds-1, self._numleds-np-1, -1):
-                self._set_pixel(i, color)
-            for i in range(0,self._numleds-np):
-                self._set_pixel(i, BLACK)
+            self._fillRange(self._numleds-np, self._numleds, color)
+            self._fillRange(0, self._numleds-np, BLACK)
         self._np.write()
         Log.i(f'{self._name} set color to {color}')
 
@@ -123,7 +130,8 @@ class LightStrip(Light):
         need to call setColor or setPixel again.
         """
         
-        self._brightness = brightness
+        if brightness != self._brightness:
+            self._setLut(brightness)
         Log.i(f'{self._name} set brightness to {brightness}')
         
     def run(self, runtype=0):
@@ -150,9 +158,32 @@ class LightStrip(Light):
 
 
     ################# Internal functions should not be used outside here #################
+    def _setLut(self, brightness):
+        self._brightness = brightness
+        lut = self._lut
+        for v in range(256):
+            lut[v] = min(255, int(v*brightness))
+        self._wheel = None
+
     def _set_pixel(self, p, color):
-        modifiedcolor = tuple(int(col*self._brightness) for col in color)
-        self._np[p] = modifiedcolor
+        o = p * self._bpp
+        buf = self._buf
+        lut = self._lut
+        order = self._order
+        buf[o + order[0]] = lut[color[0]]
+        buf[o + order[1]] = lut[color[1]]
+        buf[o + order[2]] = lut[color[2]]
+
+    def _fillRange(self, start, end, color):
+        # pixels start..end-1 all one color, as one slice assignment
+        if end <= start:
+            return
+        pixel = self._pixel
+        order = self._order
+        for i in range(3):
+            pixel[order[i]] = self._lut[color[i]]
+        bpp = self._bpp
+        self._buf[start*bpp:end*bpp] = pixel * (end - start)
 
     def _clear(self):
         self._np.fill(BLACK)
@@ -187,15 +218,34 @@ class LightStrip(Light):
     
     
     def rainbow_cycle(self, wait):
+        if self._wheel is None:
+            # all 256 wheel colors, brightness-scaled and in wire order, built once
+            self._wheel = bytearray(256 * self._bpp)
+            for pos in range(256):
+                self._set_wheel(pos)
+        wheel = self._wheel
+        buf = self._buf
+        bpp = self._bpp
+        starts = [i * 256 // self._numleds for i in range(self._numleds)]
         for j in range(255):
             if not self._running:
                 break
-            for i in range(self._numleds):
-                rc_index = (i * 256 // self._numleds) + j
-                self._set_pixel(i, self.wheel(rc_index & 255))
+            o = 0
+            for start in starts:
+                w = ((start + j) & 255) * bpp
+                buf[o] = wheel[w]
+                buf[o + 1] = wheel[w + 1]
+                buf[o + 2] = wheel[w + 2]
+                o += bpp
             self._np.write()
             time.sleep(wait)
 
+    def _set_wheel(self, pos):
+        color = self.wheel(pos)
+        o = pos * self._bpp
+        for i in range(3):
+            self._wheel[o + self._order[i]] = self._lut[color[i]]
+
 if __name__== '__main__':
     ls = LightStrip(pin=2, name='Lightring', numleds=8, brightness=0.5)
     ls.on()
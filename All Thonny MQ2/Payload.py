@@ -0,0 +1,98 @@
+"""
+# Payload.py
+# Wire formats for the sensor readings sent by the DAL, from the full
+# ORDS dictionary down to a positional array, and the decoder that turns
+# any of them back into the full dictionary on the receiving side.
+# Runs on the Pico and on a PC.
+"""
+
+class Payload:
+    """
+    The formats, from biggest to smallest:
+
+        full    - the dictionary from DAL.buildPayload as is
+        compact - full without the null fields and without reading_ts
+                  (it is always the same as timestamp)
+        short   - compact with the short keys below
+        array   - [VERSION, value, value, ...] in FIELDS order, trailing
+                  nulls dropped
+
+    FIELDS covers the keys of every DAL variant (temperature, humidity and
+    gas Picos name a couple of them differently), so one decoder reads
+    them all. Only ever add new fields at the end of FIELDS, and bump
+    VERSION if the order has to change.
+    """
+
+    FORMATS = ('full', 'compact', 'short', 'array')
+    VERSION = 1
+    FIELDS = ("timestamp", "room_id", "sensor_id", "warehouse_id",
+              "temp_c", "temperature", "humidity", "gas", "smoke_ppm",
+              "hydrogen_ppm", "lpg_ppm", "methane_ppm")
+    SHORT = ("ts", "r", "s", "w",
+             "t", "T", "h", "g", "sm",
+             "h2", "lpg", "ch4")
+
+    @classmethod
+    def encode(cls, payload, format='full'):
+        """ Turn a buildPayload dictionary into the given wire format """
+
+        if format == 'full':
+            return payload
+        if format == 'compact':
+            return {k: v for k, v in payload.items() if v is not None and k != "reading_ts"}
+        if format == 'short':
+            out = {}
+            for i in range(len(cls.FIELDS)):
+                v = payload.get(cls.FIELDS[i])
+                if v is not None:
+                    out[cls.SHORT[i]] = v
+            return out
+        if format == 'array':
+            out = [cls.VERSION]
+            for name in cls.FIELDS:
+                out.append(payload.get(name))
+            while out[-1] is None:
+                out.pop()
+            return out
+        raise ValueError(f"Payload: unknown format {format}")
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Turn one reading in any of the formats back into the full dictionary.
+        Fields that were not sent come back as None.
+        """
+
+        out = {}
+        if isinstance(data, list):
+            if data[0] != cls.VERSION:
+                raise ValueError(f"Payload: unknown array version {data[0]}")
+            for i in range(len(cls.FIELDS)):
+                out[cls.FIELDS[i]] = data[i + 1] if i + 1 < len(data) else None
+        elif "ts" in data:
+            for i in range(len(cls.FIELDS)):
+                out[cls.FIELDS[i]] = data.get(cls.SHORT[i])
+        else:
+            for name in cls.FIELDS:
+                out[name] = data.get(name)
+        out["reading_ts"] = out["timestamp"]
+        if isinstance(data, dict) and data.get("reading_ts") is not None:
+            out["reading_ts"] = data["reading_ts"]
+        return out
+
+    @classmethod
+    def decodeBatch(cls, data):
+        """ Decode a bulk POST body - a list of readings in any of the formats """
+
+        return [cls.decode(reading) for reading in data]
+
+if __name__ == "__main__":
+    import ujson
+    reading = {"timestamp": "2025-01-01 12:00:00", "reading_ts": "2025-01-01 12:00:00",
+               "room_id": 101, "sensor_id": 202, "temperature": 21.5, "humidity": None,
+               "smoke_ppm": None, "hydrogen_ppm": None, "lpg_ppm": None, "methane_ppm": None,
+               "warehouse_id": 1}
+    for format in Payload.FORMATS:
+        wire = ujson.dumps(Payload.encode(reading, format))
+        print(f"{format:8s} {len(wire):4d} bytes  {wire}")
+        print(f"         decoded: {Payload.decode(ujson.loads(wire))}")
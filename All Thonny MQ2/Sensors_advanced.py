@@ -1,19 +1,106 @@
+import ujson
 from Sensors import *
 class GasSensor(Sensor):
+
+    # Saved calibration format, the same as the MQ2 folder's
+    CACHE_VERSION = 2
+
+    # A clean air reading this far above the calibrated clean air ratio
+    # means RO is out of date (lower readings could be gas, never recalibrate)
+    DRIFT_TOLERANCE = 0.3
+
     def __init__(self, pin, name='GasSensor', lowActive=False,
-                 threshold=1.5, baseVoltage=3.3):
+                 threshold=1.5, baseVoltage=3.3, background=False, lookup=False,
+                 cachefile='mq2_cal.json', maxage=7*24*3600, clock=None):
+        # background=True: readings never block, call sample() every half
+        # second or more often and they come from the averaged RS
+        # lookup=True: readAll interpolates precomputed gas curve tables
+        # cachefile: RO is saved there (None to always calibrate) and reused
+        # at boot for maxage seconds, dated by clock (a TimeService) once
+        # it has synced from NTP
         super().__init__(name, lowActive)
 
         from mq2 import MQ2
-        self._mq2 = MQ2(pin, baseVoltage=baseVoltage)
+        strategy = MQ2.STRATEGY_BACKGROUND if background else MQ2.STRATEGY_ACCURATE
+        self._mq2 = MQ2(pin, baseVoltage=baseVoltage, measuringStrategy=strategy, lookup=lookup)
         self._threshold = threshold
+        self._cachefile = cachefile
+        self._clock = clock
+        self._sensorid = f'{name}:{pin}'
+        # what to do with the first full background window: None, 'check' or 'recalibrate'
+        self._pending = None
+
+        # A fresh saved RO is used as is - checked for drift by the first
+        # background window. A stale one (or one of unknown age without a
+        # synced clock) is replaced by that window, or redone right away
+        # without background sampling.
+        cal = self._loadCalibration(maxage)
+        if cal == 'fresh' or (cal == 'unknown' and background):
+            self._pending = 'check' if background else None
+        elif cal == 'stale' and background:
+            self._pending = 'recalibrate'
+        else:
+            print("GasSensor: warming up...")
+            utime.sleep(2)
 
-        print("GasSensor: warming up...")
-        utime.sleep(2)
+            print("GasSensor: calibrating in clean air...")
+            self._mq2.calibrate()
+            print("GasSensor: calibration complete.")
+            self._saveCalibration()
 
-        print("GasSensor: calibrating in clean air...")
-        self._mq2.calibrate()
-        print("GasSensor: calibration complete.")
+    def _loadCalibration(self, maxage):
+        """Apply a saved RO for this sensor. Returns 'fresh', 'stale',
+        'unknown' (age can't be told yet) or None if there is none"""
+        if self._cachefile is None:
+            return None
+        try:
+            with open(self._cachefile) as f:
+                cal = ujson.load(f)
+        except (OSError, ValueError):
+            return None
+        if cal.get('v') != self.CACHE_VERSION or cal.get('id') != self._sensorid or cal.get('ro', 0) <= 0:
+            return None
+        self._mq2.calibrate(cal['ro'])
+        ts = cal.get('ts')
+        if ts is None:
+            print("GasSensor: saved RO =", cal['ro'], "(saved before the clock was set)")
+            return 'stale'
+        if self._clock is None or not self._clock.synced:
+            print("GasSensor: saved RO =", cal['ro'], "(age unknown)")
+            return 'unknown'
+        age = self._clock.now() - ts
+        print("GasSensor: saved RO =", cal['ro'], "(", age, "sec old)")
+        return 'fresh' if 0 <= age <= maxage else 'stale'
+
+    def _saveCalibration(self):
+        """Save RO with the sensor id and the time (None while the clock is not synced)"""
+        if self._cachefile is None:
+            return
+        ts = self._clock.now() if self._clock is not None and self._clock.synced else None
+        try:
+            with open(self._cachefile, 'w') as f:
+                ujson.dump({'v': self.CACHE_VERSION, 'id': self._sensorid, 'ro': self._mq2._ro, 'ts': ts}, f)
+        except OSError as e:
+            print("GasSensor: could not save calibration:", e)
+
+    def sample(self):
+        """Take one background sample if due, True when a new average is ready.
+        The first full window also finishes a pending drift check or recalibration"""
+        published = self._mq2.sample()
+        if published and self._pending is not None:
+            rs = self._mq2.cachedRs()
+            cleanair = self._mq2.getRoInCleanAir()
+            if self._pending == 'check':
+                drift = (rs / self._mq2._ro - cleanair) / cleanair
+                if drift > self.DRIFT_TOLERANCE:
+                    print("GasSensor: calibration drifted by", drift, "- recalibrating")
+                    self._pending = 'recalibrate'
+            if self._pending == 'recalibrate':
+                self._mq2.calibrate(rs / cleanair)
+                self._saveCalibration()
+                print("GasSensor: recalibrated in background, RO =", self._mq2._ro)
+            self._pending = None
+        return published
 
     def rawValue(self):
         """Return RS/RO ratio (≈1 in clean air)"""
@@ -33,13 +120,20 @@ class GasSensor(Sensor):
         else:
             return ratio >= self._threshold
 
+    def readAll(self):
+        """All four gases in ppm from one reading, as the array MQ2.readAll
+        returns (index it with MQ2.LPG, SMOKE, HYDROGEN and METHANE)"""
+        return self._mq2.readAll()
+
     def getGasConcentrations(self):
         try:
+            mq2 = self._mq2
+            values = mq2.readAll()
             return {
-                'LPG': self._mq2.readLPG(),
-                'Smoke': self._mq2.readSmoke(),
-                'Hydrogen': self._mq2.readHydrogen(),
-                'Methane': self._mq2.readMethane()
+                'LPG': values[mq2.LPG],
+                'Smoke': values[mq2.SMOKE],
+                'Hydrogen': values[mq2.HYDROGEN],
+                'Methane': values[mq2.METHANE]
             }
         except Exception as e:
             print("GasSensor concentration error:", e)
@@ -4,7 +4,28 @@
 
 from lcd_api import LcdApi
 from machine import Pin
-from utime import sleep_ms, sleep_us
+from utime import sleep_ms, sleep_us, ticks_us, ticks_add, ticks_diff
+
+# RP2040 SIO registers - writing a mask sets or clears those GPIO outputs
+# in one go. Only used on an RP2040, other chips keep the per-pin writes.
+SIO_GPIO_OUT_SET = 0xd0000014
+SIO_GPIO_OUT_CLR = 0xd0000018
+
+# An LCD command or character needs 37 usec to execute before the next one
+EXEC_US = 40
+
+
+def gpio_number(pin):
+    """Returns the GPIO number of a machine.Pin (from its repr, which is
+    "Pin(GPIO5, ...)" or "Pin(5, ...)"), or None if it can't be told.
+    """
+    try:
+        name = str(pin).split('(')[1].split(',')[0].split(')')[0]
+        if name.startswith('GPIO'):
+            name = name[4:]
+        return int(name)
+    except (IndexError, ValueError):
+        return None
 
 
 class GpioLcd(LcdApi):
@@ -13,7 +34,7 @@ class GpioLcd(LcdApi):
     def __init__(self, rs_pin, enable_pin, d0_pin=None, d1_pin=None,
                  d2_pin=None, d3_pin=None, d4_pin=None, d5_pin=None,
                  d6_pin=None, d7_pin=None, rw_pin=None, backlight_pin=None,
-                 num_lines=2, num_columns=16):
+                 num_lines=2, num_columns=16, fast=True):
         """Constructs the GpioLcd object. All of the arguments must be machine.Pin
         objects which describe which pin the given line from the LCD is
         connected to.
@@ -25,6 +46,11 @@ class GpioLcd(LcdApi):
         The enable 8-bit mode, you need pass d0 through d7.
         The rw pin isn't used by this library, but if you specify it, then
         it will be set low.
+        With fast (the default) on an RP2040 in 4-bit mode, each nibble is
+        put on the data pins with a single register write instead of a
+        Pin.value() call per pin, and instead of sleeping 100 usec after
+        every nibble, a byte only waits until the one before it has had
+        its 37 usec to execute.
         """
         self.rs_pin = rs_pin
         self.enable_pin = enable_pin
@@ -80,6 +106,7 @@ class GpioLcd(LcdApi):
         if self.backlight_pin is not None:
             self.backlight_pin.init(Pin.OUT)
             self.backlight_pin.value(0)
+        self._fast = fast and self._4bit and self._setup_fast()
 
         # See about splitting this into begin
 
@@ -101,6 +128,55 @@ class GpioLcd(LcdApi):
             cmd |= self.LCD_FUNCTION_2LINES
         self.hal_write_command(cmd)
 
+    def _setup_fast(self):
+        """Works out the register masks for the fast path. Returns False
+        if it can't be used here.
+        """
+        try:
+            from machine import mem32
+            from os import uname
+            if 'RP2040' not in uname().machine:
+                return False
+        except (ImportError, AttributeError):
+            return False
+        pins = [gpio_number(pin) for pin in (self.rs_pin, self.enable_pin, self.d4_pin,
+                                             self.d5_pin, self.d6_pin, self.d7_pin)]
+        if None in pins:
+            return False
+        self._mem32 = mem32
+        self._rs_mask = 1 << pins[0]
+        self._e_mask = 1 << pins[1]
+        # the set mask for each of the 16 nibble values
+        self._nibble_masks = [sum(1 << pins[2 + bit] for bit in range(4) if nibble & (1 << bit))
+                              for nibble in range(16)]
+        self._clear_mask = self._rs_mask | self._e_mask | self._nibble_masks[15]
+        self._ready = ticks_us()
+        return True
+
+    def _write_fast(self, value, rs):
+        """Writes a byte to the LCD with register writes (4-bit mode).
+        Data is latched on the falling edge of E.
+        """
+        mem32 = self._mem32
+        e = self._e_mask
+        masks = self._nibble_masks
+        high = masks[value >> 4]
+        low = masks[value & 0x0f]
+        if rs:
+            high |= self._rs_mask
+            low |= self._rs_mask
+        while ticks_diff(ticks_us(), self._ready) < 0:
+            pass
+        mem32[SIO_GPIO_OUT_CLR] = self._clear_mask
+        mem32[SIO_GPIO_OUT_SET] = high
+        mem32[SIO_GPIO_OUT_SET] = e     # each write takes well over the 450 nsec E needs
+        mem32[SIO_GPIO_OUT_CLR] = e
+        mem32[SIO_GPIO_OUT_CLR] = masks[15]
+        mem32[SIO_GPIO_OUT_SET] = low
+        mem32[SIO_GPIO_OUT_SET] = e
+        mem32[SIO_GPIO_OUT_CLR] = e
+        self._ready = ticks_add(ticks_us(), EXEC_US)
+
     def hal_pulse_enable(self):
         """Pulse the enable line high, and then low again."""
         self.enable_pin.value(0)
@@ -130,8 +206,11 @@ class GpioLcd(LcdApi):
         """Writes a command to the LCD.
         Data is latched on the falling edge of E.
         """
-        self.rs_pin.value(0)
-        self.hal_write_8bits(cmd)
+        if self._fast:
+            self._write_fast(cmd, False)
+        else:
+            self.rs_pin.value(0)
+            self.hal_write_8bits(cmd)
         if cmd <= 3:
             # The home and clear commands require a worst
             # case delay of 4.1 msec
@@ -139,8 +218,23 @@ class GpioLcd(LcdApi):
 
     def hal_write_data(self, data):
         """Write data to the LCD."""
-        self.rs_pin.value(1)
-        self.hal_write_8bits(data)
+        if self._fast:
+            self._write_fast(data, True)
+        else:
+            self.rs_pin.value(1)
+            self.hal_write_8bits(data)
+
+    def hal_write_data_burst(self, data, cmd=None):
+        """Write a command (if given) followed by a run of data bytes."""
+        if not self._fast:
+            LcdApi.hal_write_data_burst(self, data, cmd)
+            return
+        if cmd is not None:
+            self.hal_write_command(cmd)
+        write = self._write_fast
+        text = isinstance(data, str)
+        for byte in data:
+            write(ord(byte) if text else byte, True)
 
     def hal_write_8bits(self, value):
         """Writes 8 bits of data to the LCD."""
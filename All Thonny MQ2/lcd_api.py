@@ -124,12 +124,27 @@ class LcdApi:
         """
         self.cursor_x = cursor_x
         self.cursor_y = cursor_y
+        self.hal_write_command(self.LCD_DDRAM | self.ddram_address(cursor_x, cursor_y))
+
+    def ddram_address(self, cursor_x, cursor_y):
+        """Returns the display RAM address of the indicated position."""
         addr = cursor_x & 0x3f
         if cursor_y & 1:
             addr += 0x40    # Lines 1 & 3 add 0x40
         if cursor_y & 2:    # Lines 2 & 3 add number of columns
             addr += self.num_columns
-        self.hal_write_command(self.LCD_DDRAM | addr)
+        return addr
+
+    def write_at(self, cursor_x, cursor_y, data):
+        """Writes data (a string or bytes) starting at the indicated position
+        without wrapping, and leaves the cursor just after it. The cursor
+        move and the data go to the hal together, so an I2C hal can send
+        them as one transfer.
+        """
+        self.hal_write_data_burst(data, self.LCD_DDRAM |
+                                  self.ddram_address(cursor_x, cursor_y))
+        self.cursor_x = cursor_x + len(data)
+        self.cursor_y = cursor_y
 
     def putchar(self, char):
         """Writes the indicated character to the LCD at the current cursor
@@ -157,8 +172,28 @@ class LcdApi:
         """Write the indicated string to the LCD at the current cursor
         position and advances the cursor position appropriately.
         """
-        for char in string:
-            self.putchar(char)
+        pos = 0
+        while pos < len(string):
+            if string[pos] == '\n':
+                self.putchar('\n')
+                pos += 1
+                continue
+            # the rest of this line in one go - the LCD advances its own
+            # cursor, so it only needs moving when we wrap
+            end = min(len(string), pos + max(1, self.num_columns - self.cursor_x))
+            newline = string.find('\n', pos, end)
+            if newline >= 0:
+                end = newline
+            self.hal_write_data_burst(string[pos:end])
+            self.cursor_x += end - pos
+            pos = end
+            if self.cursor_x >= self.num_columns:
+                self.cursor_x = 0
+                self.cursor_y += 1
+                self.implied_newline = True
+                if self.cursor_y >= self.num_lines:
+                    self.cursor_y = 0
+                self.move_to(self.cursor_x, self.cursor_y)
 
     def custom_char(self, location, charmap):
         """Write a character to one of the 8 CGRAM locations, available
@@ -198,6 +233,16 @@ class LcdApi:
         """
         raise NotImplementedError
 
+    def hal_write_data_burst(self, data, cmd=None):
+        """Write a command (if given) followed by a run of data bytes.
+        data may be a string or bytes. A derived HAL class can override
+        this to send it all at once, by default it is done a byte at a time.
+        """
+        if cmd is not None:
+            self.hal_write_command(cmd)
+        for byte in data:
+            self.hal_write_data(ord(byte) if isinstance(byte, str) else byte)
+
     def hal_sleep_us(self, usecs):
         """Sleep for some time (given in microseconds)."""
         time.sleep_us(usecs)
\ No newline at end of file
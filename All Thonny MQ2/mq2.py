@@ -4,6 +4,7 @@
 
 from machine import Pin, ADC
 from micropython import const
+from array import array
 import utime
 from math import log10
 
@@ -20,6 +21,9 @@ class BaseMQ(object):
 
     STRATEGY_FAST = const(1)
     STRATEGY_ACCURATE = const(2)
+    # Never blocks - sample() takes one reading at a time from the main loop
+    # and every read uses the RS averaged over the last full window
+    STRATEGY_BACKGROUND = const(3)
 
     def __init__(self, pinData, pinHeater=-1, boardResistance=10,
                  baseVoltage=3.3, measuringStrategy=STRATEGY_ACCURATE):
@@ -35,6 +39,12 @@ class BaseMQ(object):
 
         self.pinData = ADC(pinData)
 
+        # Background sampler: ring buffer of RS readings and the last average
+        self._samples = array('f', [0] * self.MQ_SAMPLE_TIMES)
+        self._sampleIndex = 0
+        self._lastSample = utime.ticks_ms()
+        self._rsCache = None
+
         # Optional heater pin
         if pinHeater != -1:
             self._useSeparateHeater = True
@@ -46,6 +56,12 @@ class BaseMQ(object):
     # CALIBRATION — performed in clean air (important!)
     # -----------------------------------------------------
     def calibrate(self, ro=-1.0):
+        # a known RO (saved from an earlier calibration) skips the sampling
+        if ro > 0:
+            self._ro = float(ro)
+            self._stateCalibrate = True
+            return
+
         print("Calibrating MQ sensor...")
 
         rs_sum = 0.0
@@ -91,6 +107,12 @@ class BaseMQ(object):
     # INTERNAL: read RS with averaging
     # -----------------------------------------------------
     def _readRS(self):
+        if self.measuringStrategy == self.STRATEGY_BACKGROUND:
+            # a single reading until the first window is complete
+            if self._rsCache is not None:
+                return self._rsCache
+            return self._calculateRS(self.pinData.read_u16())
+
         if self.measuringStrategy == self.STRATEGY_ACCURATE:
             rs_sum = 0.0
             for _ in range(self.MQ_SAMPLE_TIMES):
@@ -103,6 +125,31 @@ class BaseMQ(object):
             raw = self.pinData.read_u16()
             return self._calculateRS(raw)
 
+    # -----------------------------------------------------
+    # BACKGROUND SAMPLING (STRATEGY_BACKGROUND)
+    # -----------------------------------------------------
+    def sample(self):
+        # Call often. Takes at most one ADC reading, MQ_SAMPLE_INTERVAL apart,
+        # and returns True when a full window has been averaged into the cache
+        now = utime.ticks_ms()
+        if utime.ticks_diff(now, self._lastSample) < self.MQ_SAMPLE_INTERVAL:
+            return False
+        self._lastSample = now
+        self._samples[self._sampleIndex] = self._calculateRS(self.pinData.read_u16())
+        self._sampleIndex += 1
+        if self._sampleIndex < self.MQ_SAMPLE_TIMES:
+            return False
+        self._sampleIndex = 0
+        rs_sum = 0.0
+        for rs in self._samples:
+            rs_sum += rs
+        self._rsCache = rs_sum / self.MQ_SAMPLE_TIMES
+        return True
+
+    def cachedRs(self):
+        # last averaged RS from sample(), None until the first window is done
+        return self._rsCache
+
     # -----------------------------------------------------
     # PUBLIC: Read RS/RO ratio
     # -----------------------------------------------------
@@ -134,36 +181,116 @@ class MQ2(BaseMQ):
     # Clean air RS/RO ratio from the MQ2 datasheet graph
     MQ2_RO_BASE = 9.83
 
+    # Positions of the gases in the readAll result
+    LPG = const(0)
+    METHANE = const(1)
+    SMOKE = const(2)
+    HYDROGEN = const(3)
+
+    # Datasheet curves (slope, intercept) in the same order
+    CURVES = ((-0.47, 1.41), (-0.38, 1.50), (-0.43, 1.70), (-0.48, 1.57))
+
+    # Points in each lookup table (256 segments over the ADC range)
+    LUT_SIZE = const(257)
+
+    # lookup=True: calibrate() precomputes ppm-vs-ADC tables for the four
+    # curves and readAll interpolates them instead of using log10 and pow
     def __init__(self, pinData, pinHeater=-1, boardResistance=10,
                  baseVoltage=3.3,
-                 measuringStrategy=BaseMQ.STRATEGY_ACCURATE):
+                 measuringStrategy=BaseMQ.STRATEGY_ACCURATE, lookup=False):
 
         super().__init__(pinData, pinHeater, boardResistance,
                          baseVoltage, measuringStrategy)
 
+        # result buffer reused by every readAll call
+        self._all = array('f', [0] * 4)
+        self._useLookup = lookup
+        # the four tables one after the other, built by calibrate
+        self._lut = None
+
+    def calibrate(self, ro=-1.0):
+        super().calibrate(ro)
+        if self._useLookup:
+            self.buildLookupTables()
+
+    # -----------------------------------------------------
+    # LOOKUP TABLES
+    # -----------------------------------------------------
+    def buildLookupTables(self):
+        # ppm of each gas at LUT_SIZE evenly spaced ADC values for the
+        # current RO. Entry 0 (no voltage, endless RS) is 0 ppm, and the last
+        # one uses half a step below full scale, where RS would be 0
+        size = self.LUT_SIZE
+        step = 65535 / (size - 1)
+        lut = array('f', [0] * (4 * size))
+        for i in range(1, size):
+            raw = i * step if i < size - 1 else 65535 - step / 2
+            logratio = log10(self._calculateRS(raw) / self._ro)
+            g = 0
+            for (m, b) in self.CURVES:
+                lut[g * size + i] = 10 ** ((logratio - b) / m)
+                g += 1
+        self._lut = lut
+
+    def _lookupFromRS(self, rs):
+        # back from RS to the ADC reading that gives it (the inverse of
+        # _calculateRS), so an averaged RS maps onto the tables too
+        size = self.LUT_SIZE
+        pos = self._boardResistance / (rs + self._boardResistance) * (size - 1)
+        i = int(pos)
+        if i >= size - 1:
+            i = size - 2
+        frac = pos - i
+        lut = self._lut
+        result = self._all
+        for g in range(4):
+            lo = lut[g * size + i]
+            result[g] = lo + (lut[g * size + i + 1] - lo) * frac
+        return result
+
     # -----------------------------------------------------
     # GAS PPM CALCULATIONS (official MQ-2 curves)
     # -----------------------------------------------------
 
     def readLPG(self):
-        # Datasheet: slope=-0.47, intercept=1.41
-        ratio = self.readRatio()
-        return self._ppm_from_ratio(ratio, -0.47, 1.41)
+        return self._ppm_from_ratio(self.readRatio(), *self.CURVES[self.LPG])
 
     def readMethane(self):
-        # Datasheet: slope=-0.38, intercept=1.50
-        ratio = self.readRatio()
-        return self._ppm_from_ratio(ratio, -0.38, 1.50)
+        return self._ppm_from_ratio(self.readRatio(), *self.CURVES[self.METHANE])
 
     def readSmoke(self):
-        # Datasheet: slope=-0.43, intercept=1.70
-        ratio = self.readRatio()
-        return self._ppm_from_ratio(ratio, -0.43, 1.70)
+        return self._ppm_from_ratio(self.readRatio(), *self.CURVES[self.SMOKE])
 
     def readHydrogen(self):
-        # Datasheet: slope=-0.48, intercept=1.57
-        ratio = self.readRatio()
-        return self._ppm_from_ratio(ratio, -0.48, 1.57)
+        return self._ppm_from_ratio(self.readRatio(), *self.CURVES[self.HYDROGEN])
+
+    # -----------------------------------------------------
+    # ALL FOUR GASES FROM ONE READING
+    # -----------------------------------------------------
+    def readAll(self):
+        # One RS reading and one log10 for all four gases. Returns an
+        # array('f') indexed by MQ2.LPG, METHANE, SMOKE and HYDROGEN - the
+        # same array is overwritten by the next call
+        if not self._stateCalibrate:
+            raise RuntimeError("ERROR: MQ sensor NOT calibrated — call calibrate() first")
+        return self.concentrationsFromRs(self._readRS())
+
+    def concentrationsFromRs(self, rs):
+        # from the lookup tables if they were built, otherwise exact
+        if self._lut is not None:
+            return self._lookupFromRS(rs)
+        result = self._all
+        ratio = rs / self._ro
+        if ratio <= 0:
+            for i in range(4):
+                result[i] = 0
+            return result
+        logratio = log10(ratio)
+        i = 0
+        for (m, b) in self.CURVES:
+            result[i] = 10 ** ((logratio - b) / m)
+            i += 1
+        return result
 
     # MQ2-specific clean air RO value
     def getRoInCleanAir(self):
@@ -8,7 +8,8 @@ from Buzzer import PassiveBuzzer
 from Displays import LCDDisplay
 from warehouseStateModel import *
 from DAL import DAL
-from NET import NET
+from AsyncNET import AsyncNET
+from TimeService import TimeService
 import secrets
 
 RED    = (255, 0, 0)
@@ -29,8 +30,13 @@ class WarehouseAlarmController:
 
         Log.i("Initializing GAS-Only Alarm System...")
 
-        # GAS SENSOR
-        self.gas = GasSensor(pin=26, name="mq2")
+        # NTP time for the reading timestamps, re-synced every 6 hours.
+        # Also dates the gas sensor's saved calibration
+        self.clock = TimeService()
+
+        # GAS SENSOR - background sampling, readings never block the loop,
+        # and table lookups instead of log10/pow for the gas curves
+        self.gas = GasSensor(pin=26, name="mq2", background=True, lookup=True, clock=self.clock)
 
         # ACTUATORS
         self.buzzer = PassiveBuzzer(pin=15, name="buzzer")
@@ -39,15 +45,18 @@ class WarehouseAlarmController:
         self.resetButton = Button(pin=17, name="reset", handler=None)
 
         # NETWORK + DATABASE
-        self.net = NET(secrets.SSID, secrets.PASSWORD)
+        self.net = AsyncNET(secrets.SSID, secrets.PASSWORD)
+
         self.dal = DAL(
             net=self.net,
+            clock=self.clock,
             url="https://oracleapex.com/ords/priscilallopes/api/sensor-readings",
             warehouse_id=1,
             room_id=ROOM_ID
         )
 
-        self.net.connect()
+        # Connect WiFi in the background - the wifi timer keeps it going
+        self.net.start(self._wifiChanged)
 
         # -------- STATE MACHINE --------
         machine = WarehouseStateMachine(self, debug=True)
@@ -62,9 +71,21 @@ class WarehouseAlarmController:
         self.model.addTransition(STATE_ALARM,   ["reset_event"], STATE_NORMAL)
 
         # TIMER
-        self.sensorTimer = SoftwareTimer("sensorpoll", None)
+        self.sensorTimer = SoftwareTimer("sensorpoll", None, periodic=True)
         self.model.addTimer(self.sensorTimer)
 
+        # Feeds the MQ2 background sampler one ADC reading at a time
+        self.sampleTimer = SoftwareTimer("gassample", None, periodic=True)
+        self.model.addTimer(self.sampleTimer)
+
+        # Sends readings that were queued while offline, a couple at a time
+        self.uploadTimer = SoftwareTimer("upload", None, periodic=True)
+        self.model.addTimer(self.uploadTimer)
+
+        # Checks the WiFi link and reconnects (with backoff) when it drops
+        self.wifiTimer = SoftwareTimer("wifi", None, periodic=True)
+        self.model.addTimer(self.wifiTimer)
+
         # OLD WORKING THRESHOLDS
         self.WARNING_GAS = 70
         self.ALARM_GAS   = 90
@@ -83,21 +104,18 @@ class WarehouseAlarmController:
 
         if state == STATE_NORMAL:
             self._alarmoff()
-            self.display.clear()
-            self.display.showText("NORMAL SYSTEM", 0, 0)
+            self.display.showLines("NORMAL SYSTEM")
             self.light.setColor(GREEN)
 
         elif state == STATE_WARNING:
-            self.display.clear()
-            self.display.showText("WARNING", 0, 0)
-            self.display.showText("CHECK GAS SENSOR", 1, 0)
+            self.display.showLines("WARNING", "CHECK GAS SENSOR")
             self.light.setColor(YELLOW)
 
         elif state == STATE_ALARM:
             Log.e("!!! GAS ALARM !!!")
-            self.display.clear()
-            self.display.showText("*** GAS ALARM ***", 0, 0)
-            self.display.showText("PRESS RESET!", 1, 0)
+            # the alarm text is wider than the display - scroll it in the top row
+            self.display.showLines("", "PRESS RESET!")
+            self.display.startScroll("*** GAS ALARM ***", 0)
 
             self._alarmon = True
             self.light.setColor(RED)
@@ -134,10 +152,25 @@ class WarehouseAlarmController:
             self.model.processEvent("reset_event")
             return True
 
+        # One MQ2 sample
+        if event == "gassample_timeout":
+            self.gas.sample()
+            return True
+
         # Periodic reading
         if event == "sensorpoll_timeout":
             self._read_gas()
-            self.sensorTimer.start(10)
+            return True
+
+        # Offline queue
+        if event == "upload_timeout":
+            self.dal.flush()
+            return True
+
+        # WiFi connection manager
+        if event == "wifi_timeout":
+            if self.net.maintain():
+                self.clock.maintain()
             return True
 
         return False
@@ -146,15 +179,26 @@ class WarehouseAlarmController:
     # STATE DO (WARNING ONLY – blinking)
     # ======================================================
     def stateDo(self, state):
+        # let background POSTs make progress, and come back soon while any are left
+        if self.net.poll():
+            self.model.wakeAfter(0.05)
+
+        # next frame of any scrolling text on the display
+        wait = self.display.tick()
+        if wait is not None:
+            self.model.wakeAfter(wait)
 
         if state == STATE_WARNING:
             self.light.setColor(YELLOW)
             utime.sleep(0.12)
             self.light.off()
             utime.sleep(0.12)
+            self.model.wakeAfter(0)
 
         if state == STATE_ALARM:
             self._alarm_pattern()
+            # keep the tickless loop coming around while the alarm pattern runs
+            self.model.wakeAfter(0)
 
     # ======================================================
     # Alarm flashing + buzzer sequence
@@ -181,6 +225,7 @@ class WarehouseAlarmController:
     def _read_gas(self):
 
         ratio = self.gas.rawValue()
+        # one sensor reading for all four gases (MQ2.readAll)
         readings = self.gas.getGasConcentrations()
 
         gas = readings["Smoke"]
@@ -223,6 +268,14 @@ class WarehouseAlarmController:
     # ======================================================
     # HELPERS
     # ======================================================
+    def _wifiChanged(self, connected):
+        if connected:
+            self.clock.sync()
+            # send what piled up while we were offline
+            self.dal.flush()
+        else:
+            Log.e("WiFi down - readings are queued until it is back")
+
     def _alarmoff(self):
         try:
             self.buzzer.stop()
@@ -235,7 +288,11 @@ class WarehouseAlarmController:
     def run(self):
         Log.i("Starting gas polling timer (10 sec)...")
         self.sensorTimer.start(10)
-        self.model.run()
+        self.sampleTimer.start(0.5)
+        self.uploadTimer.start(5)
+        self.wifiTimer.start(2)
+        # Sleep between deadlines instead of waking up 10 times a second
+        self.model.run(tickless=True)
 
     def stop(self):
         self.model.stop()
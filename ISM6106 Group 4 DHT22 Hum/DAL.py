@@ -1,27 +1,246 @@
 import ujson
+import time
 from Log import *
 from NET import NET
+from OfflineQueue import OfflineQueue
+from Payload import Payload
+from TimeService import TimeService
 
 class DAL:
 
-    def __init__(self, net, url, warehouse_id, room_id):
+    def __init__(self, net, url, warehouse_id, room_id, queuefile='dal_queue.bin', queuesize=128,
+                 batchsize=1, batchinterval=60, bulkurl=None, encoding='full', heartbeat=300,
+                 clock=None):
+        """
+        net - the transport: NET, AsyncNET or MQTT (anything with
+            isconnected(), canSend() and postAsync(), plus poll() for the
+            background ones). Readings go out as long as the transport can
+            take them, so MQTT can have its whole window in flight. With more
+            than one in flight they are not always stored in the order taken:
+            a reading that fails goes to the back of the offline queue, behind
+            later ones that made it. Every reading carries its own timestamp,
+            so nothing depends on that order
+        batchsize - readings sent per POST. 1 (the default) posts every reading
+            as it comes in. Anything bigger collects readings in the queue and
+            sends them as one JSON array to bulkurl, once batchsize readings are
+            waiting or batchinterval seconds have passed since the last batch.
+        bulkurl - the bulk variant of url, defaults to url + "/bulk"
+        encoding - wire format of the readings, one of Payload.FORMATS. 'full'
+            is what the ORDS handler takes today - the smaller ones need the
+            handler to run them through Payload.decode first
+        heartbeat - with reportOnChange, the longest we stay quiet (seconds)
+            before sending a reading even if nothing moved
+        clock - the TimeService that stamps the readings (the controller
+            shares its own so NTP syncs show up here)
+        """
         self.net = net
         self.url = url
         self.warehouse_id = warehouse_id
         self.room_id = room_id
+        # readings that could not be sent yet - kept on flash so a reboot does not lose them
+        self.queue = OfflineQueue(queuefile, maxrecords=queuesize)
+        self.batchsize = batchsize
+        self.batchinterval = batchinterval
+        self.bulkurl = bulkurl if bulkurl else url.rstrip('/') + "/bulk"
+        self.encoding = encoding
+        self.clock = clock if clock else TimeService()
+        self.heartbeat = heartbeat
+        self._deadbands = {}        # metric -> (band, thresholds)
+        self._lastvalues = {}       # metric -> last value sent
+        self._lastreport = None
+        self._lastbatch = time.ticks_ms()
+        self._flushing = False  # a queued reading or batch is in flight
+        self._sent = 0
 
     # ------------------------------------------------------
     # POST WRAPPER
+    #  - if the reading cannot be sent now it goes into the
+    #    offline queue and flush() sends it later
+    #  - NET.postAsync reports back through a callback, so with
+    #    AsyncNET nothing here waits for the network
     # ------------------------------------------------------
     def postPayload(self, payload):
-        print("DAL: posting", payload)
+        if not self._worthSending(payload):
+            Log.d("DAL: reading within deadband, not sent")
+            return None
+
+        Log.d(f"DAL: posting {payload}")
+        # encode once - the offline queue keeps the smaller form too
+        payload = Payload.encode(payload, self.encoding)
+        if self.batchsize > 1:
+            # batch mode - flush() sends it along with the others
+            self.queue.append(payload)
+            return None
+
+        if len(self.queue) > 0 or self._flushing or not self.net.isconnected() or not self.net.canSend():
+            # new readings wait behind the queued ones, so the backlog goes
+            # out oldest first (a failed in-flight one can still end up
+            # behind later readings - see the net argument above)
+            self.queue.append(payload)
+            Log.i(f"DAL: queued for later ({len(self.queue)} waiting)")
+            return None
+
         # NET.post() is expected to do something like:
         # urequests.post(self.url, json=payload)
-        return self.net.post(self.url, payload)
+        return self.net.postAsync(self.url, payload, lambda status, body: self._posted(payload, status))
+
+    def _posted(self, payload, status):
+        if self._retry(status):
+            self.queue.append(payload)
+        elif status >= 400:
+            Log.e(f"DAL: reading rejected ({status}), dropping it")
+
+    # ------------------------------------------------------
+    # CHANGE-ONLY REPORTING
+    # ------------------------------------------------------
+    def reportOnChange(self, metric, band, thresholds=()):
+        """
+        Stop sending readings where metric has moved less than band since the
+        last reading sent, e.g. reportOnChange("temperature", 0.2). A reading
+        still goes out right away if it is on the other side of one of the
+        thresholds from the last one sent (so warning/alarm levels are always
+        reported exactly), and at least every heartbeat seconds regardless.
+        """
+        self._deadbands[metric] = (band, thresholds)
+
+    def _worthSending(self, payload):
+        if not self._deadbands:
+            return True
+
+        now = time.ticks_ms()
+        send = self._lastreport is None or time.ticks_diff(now, self._lastreport) >= self.heartbeat * 1000
+        for metric in self._deadbands:
+            value = payload.get(metric)
+            if value is None:
+                continue
+            last = self._lastvalues.get(metric)
+            if last is None:
+                send = True
+                continue
+            band, thresholds = self._deadbands[metric]
+            if abs(value - last) >= band:
+                send = True
+            for level in thresholds:
+                if (last < level) != (value < level):
+                    send = True
+
+        if send:
+            self._lastreport = now
+            for metric in self._deadbands:
+                if payload.get(metric) is not None:
+                    self._lastvalues[metric] = payload[metric]
+        return send
+
+    # ------------------------------------------------------
+    # OFFLINE QUEUE
+    # ------------------------------------------------------
+    def flush(self, maxrecords=2):
+        """
+        Send up to maxrecords queued readings, oldest first. Meant to be
+        called from a timer - returns straight away when nothing is queued,
+        WiFi is down, the transport cannot take another message or queued
+        readings are still in flight, and stops at the first
+        failure so a dead server only costs one POST per call. Returns the
+        number of readings sent by the time it returns (always 0 with
+        AsyncNET, where they go out in the background).
+
+        In batch mode it sends at most one batch instead, and only when the
+        batch is full or batchinterval has passed.
+        """
+        self._sent = 0
+        if self._flushing or len(self.queue) == 0 or not self.net.isconnected() or not self.net.canSend():
+            return 0
+
+        if self.batchsize > 1:
+            self._flushBatch()
+        else:
+            self._flushOne(maxrecords)
+        return self._sent
+
+    def _flushOne(self, left):
+        record = self.queue.peek()
+        if record is None:
+            return
+        self._flushing = True
+        # if the queue fills up while this is in flight, the oldest records
+        # (this one first) are evicted - the dropped count tells us
+        dropped = self.queue.dropped()
+        self.net.postAsync(self.url, record, lambda status, body: self._flushedOne(status, left - 1, dropped))
+
+    def _flushedOne(self, status, left, dropped):
+        self._flushing = False
+        if self._retry(status):
+            return
+        if status >= 400:
+            Log.e(f"DAL: queued reading rejected ({status}), dropping it")
+        if self.queue.dropped() == dropped:
+            self.queue.pop()
+        self._sent += 1
+
+        if left > 0 and len(self.queue) > 0 and self.net.isconnected() and self.net.canSend():
+            self._flushOne(left)
+        else:
+            Log.i(f"DAL: sent queued readings, {len(self.queue)} still waiting")
+
+    def _flushBatch(self):
+        """
+        Send the oldest batchsize readings as one JSON array to bulkurl.
+
+        The bulk endpoint may answer with {"results": [status, ...]}, one
+        status per reading in the order sent. Readings with a 5xx status go
+        back on the queue to be retried, 4xx ones are dropped, the rest made
+        it. Without a results list the status of the whole POST counts for
+        every reading.
+
+        Retried readings go to the back of the queue, so they are sent after
+        the ones queued in the meantime. Each reading carries its own
+        timestamp, so the order they are stored in does not matter.
+        """
+        if len(self.queue) < self.batchsize and time.ticks_diff(time.ticks_ms(), self._lastbatch) < self.batchinterval * 1000:
+            return
+
+        records = self.queue.peekMany(self.batchsize)
+        batch = [r for r in records if r is not None]
+        self._flushing = True
+        dropped = self.queue.dropped()
+        self.net.postAsync(self.bulkurl, batch, lambda status, body: self._flushedBatch(records, batch, status, body, dropped), reply=True)
+
+    def _flushedBatch(self, records, batch, status, reply, dropped):
+        self._flushing = False
+        if self._retry(status):
+            # nothing was stored - the batch stays at the front of the queue
+            return
+
+        self._lastbatch = time.ticks_ms()
+        # records evicted while the POST was in flight came off the front of
+        # the batch - only pop what is still there, never newer readings
+        evicted = self.queue.dropped() - dropped
+        self.queue.pop(max(0, len(records) - evicted))
+        if status >= 400:
+            Log.e(f"DAL: batch of {len(batch)} rejected ({status}), dropping it")
+            return
+
+        results = reply.get("results") if isinstance(reply, dict) else None
+        sent = len(batch)
+        if results and len(results) == len(batch):
+            for i in range(len(batch)):
+                if self._retry(results[i]):
+                    self.queue.append(batch[i])
+                    sent -= 1
+                elif results[i] >= 400:
+                    Log.e(f"DAL: reading rejected ({results[i]}), dropping it")
+                    sent -= 1
+        self._sent = sent
+        Log.i(f"DAL: batch sent, {sent} of {len(batch)} stored, {len(self.queue)} waiting")
+
+    def _retry(self, status):
+        """ True if a POST should be tried again later (no answer or a server error) """
+        return status is None or status >= 500
 
     # ------------------------------------------------------
     # BUILD GENERIC PAYLOAD
     #  - generates timestamp string in format: YYYY-MM-DD HH:MM:SS
+    #    (TimeService caches the date part)
     #  - IMPORTANT: includes key "timestamp" to match ORDS bind :timestamp
     # ------------------------------------------------------
     def buildPayload(self,
@@ -35,12 +254,7 @@ class DAL:
                      sensor_id=None,
                      warehouse_id=None):
 
-        import time
-        ts = time.localtime()
-        iso_ts = "%04d-%02d-%02d %02d:%02d:%02d" % (
-            ts[0], ts[1], ts[2],
-            ts[3], ts[4], ts[5]
-        )
+        iso_ts = self.clock.timestamp()
 
         # fallbacks to defaults from __init__ if not provided
         if room_id is None:
@@ -0,0 +1,175 @@
+"""
+# OfflineQueue.py
+# A small durable FIFO of JSON records kept on the Pico flash filesystem.
+# Used by the DAL to hold on to sensor readings while WiFi or the
+# database is down, and send them later.
+"""
+
+import os
+import struct
+import ujson
+from Log import *
+
+class OfflineQueue:
+    """
+    A fixed-size ring of records stored in one file. The file never grows
+    past HEADER + maxrecords * recordsize bytes - when the queue is full the
+    oldest record is overwritten by the newest one (and counted as dropped).
+
+    File layout:
+        header  - magic, head slot, count, dropped  (4 unsigned shorts)
+        slots   - maxrecords slots of recordsize bytes, each one a 2 byte
+                  length followed by the JSON text of the record
+
+    Records are written to their slot before the header is updated, so if
+    the power goes out in between, we lose at most the record being added.
+    """
+
+    MAGIC = 0x5144
+    HEADER = '<HHHH'
+    HEADERSIZE = 8
+
+    def __init__(self, path='dal_queue.bin', recordsize=320, maxrecords=128):
+        self._path = path
+        self._recordsize = recordsize
+        self._maxrecords = maxrecords
+        self._head = 0
+        self._count = 0
+        self._dropped = 0
+        self._open()
+
+    def __len__(self):
+        return self._count
+
+    def dropped(self):
+        """ Number of records that were evicted because the queue was full """
+
+        return self._dropped
+
+    def append(self, record)->bool:
+        """
+        Add a record (anything ujson can dump) at the end of the queue.
+        If the queue is full the oldest record is evicted to make room.
+        Returns False if the record is too big for a slot.
+        """
+
+        data = ujson.dumps(record).encode()
+        if len(data) > self._recordsize - 2:
+            Log.e(f"OfflineQueue: record too big ({len(data)} bytes), not queued")
+            return False
+
+        if self._count == self._maxrecords:
+            # full - the new record takes the place of the oldest one
+            slot = self._head
+            self._head = (self._head + 1) % self._maxrecords
+            self._dropped += 1
+            Log.e(f"OfflineQueue: full, dropped oldest record ({self._dropped} so far)")
+        else:
+            slot = (self._head + self._count) % self._maxrecords
+            self._count += 1
+
+        with open(self._path, 'r+b') as f:
+            f.seek(self._slotOffset(slot))
+            f.write(struct.pack('<H', len(data)))
+            f.write(data)
+            self._writeHeader(f)
+        return True
+
+    def peek(self):
+        """ Return the oldest record without removing it, or None if empty """
+
+        if self._count == 0:
+            return None
+        with open(self._path, 'rb') as f:
+            record = self._read(f, self._head)
+        if record is None:
+            # a torn write - nothing we can do with it
+            self.pop()
+            return self.peek()
+        return record
+
+    def peekMany(self, count):
+        """
+        Return up to count of the oldest records without removing them.
+        Records that cannot be read come back as None, so the length of
+        the list is always the number to pop once they are dealt with.
+        """
+
+        count = min(count, self._count)
+        records = []
+        with open(self._path, 'rb') as f:
+            for i in range(count):
+                records.append(self._read(f, (self._head + i) % self._maxrecords))
+        return records
+
+    def pop(self, count=1):
+        """ Remove the oldest record (or the oldest count records) """
+
+        count = min(count, self._count)
+        if count == 0:
+            return
+        self._head = (self._head + count) % self._maxrecords
+        self._count -= count
+        with open(self._path, 'r+b') as f:
+            self._writeHeader(f)
+
+    def clear(self):
+        """ Throw away everything in the queue """
+
+        self._head = 0
+        self._count = 0
+        with open(self._path, 'r+b') as f:
+            self._writeHeader(f)
+
+    def _read(self, f, slot):
+        """ Read the record in a slot from an open queue file, None if it is unreadable """
+
+        f.seek(self._slotOffset(slot))
+        size = min(struct.unpack('<H', f.read(2))[0], self._recordsize - 2)
+        try:
+            return ujson.loads(f.read(size))
+        except ValueError:
+            Log.e("OfflineQueue: unreadable record skipped")
+            return None
+
+    def _slotOffset(self, slot):
+        return OfflineQueue.HEADERSIZE + slot * self._recordsize
+
+    def _writeHeader(self, f):
+        f.seek(0)
+        f.write(struct.pack(OfflineQueue.HEADER, OfflineQueue.MAGIC, self._head, self._count, min(self._dropped, 0xFFFF)))
+
+    def _open(self):
+        """ Pick up a queue left on flash by an earlier run, or create a new one """
+
+        try:
+            size = os.stat(self._path)[6]
+            with open(self._path, 'rb') as f:
+                magic, head, count, dropped = struct.unpack(OfflineQueue.HEADER, f.read(OfflineQueue.HEADERSIZE))
+            if magic == OfflineQueue.MAGIC and size == self._slotOffset(self._maxrecords) and head < self._maxrecords and count <= self._maxrecords:
+                self._head = head
+                self._count = count
+                self._dropped = dropped
+                if count > 0:
+                    Log.i(f"OfflineQueue: {count} records waiting from the last run")
+                return
+            Log.e("OfflineQueue: queue file does not match, starting a new one")
+        except (OSError, ValueError):
+            pass
+
+        # Create the file at its full size once so appends never grow it
+        with open(self._path, 'wb') as f:
+            self._writeHeader(f)
+            blank = bytes(self._recordsize)
+            for i in range(self._maxrecords):
+                f.write(blank)
+
+if __name__ == "__main__":
+    q = OfflineQueue('test_queue.bin', recordsize=64, maxrecords=4)
+    q.clear()
+    for i in range(6):
+        q.append({'reading': i})
+    print(f"{len(q)} queued, {q.dropped()} dropped")
+    while len(q) > 0:
+        print(q.peek())
+        q.pop()
@@ -8,7 +8,8 @@ from Buzzer import PassiveBuzzer
 from Displays import LCDDisplay
 from warehouseStateModel import *
 from DAL import DAL
-from NET import NET
+from AsyncNET import AsyncNET
+from TimeService import TimeService
 import secrets
 
 # ----------------------------------------------------------
@@ -40,16 +41,21 @@ class WarehouseAlarmController:
         self.resetButton = Button(pin=17, name="reset", handler=None)
 
         # -------- NETWORK + DAL --------
-        self.net = NET(secrets.SSID, secrets.PASSWORD)
+        self.net = AsyncNET(secrets.SSID, secrets.PASSWORD)
+
+        # NTP time for the reading timestamps, re-synced every 6 hours
+        self.clock = TimeService()
 
         self.dal = DAL(
             net=self.net,
+            clock=self.clock,
             url="https://oracleapex.com/ords/priscilallopes/api/sensor-readings",
             warehouse_id=1,
             room_id=ROOM_ID
         )
 
-        self.net.connect()
+        # Connect WiFi in the background - the wifi timer keeps it going
+        self.net.start(self._wifiChanged)
 
         # -------- STATE MACHINE --------
         machine = WarehouseStateMachine(self, debug=True)
@@ -67,14 +73,25 @@ class WarehouseAlarmController:
         self.model.addTransition(STATE_ALARM,   ["reset_event"], STATE_NORMAL)
 
         # Timer
-        self.sensorTimer = SoftwareTimer("sensorpoll", None)
+        self.sensorTimer = SoftwareTimer("sensorpoll", None, periodic=True)
         self.model.addTimer(self.sensorTimer)
 
+        # Sends readings that were queued while offline, a couple at a time
+        self.uploadTimer = SoftwareTimer("upload", None, periodic=True)
+        self.model.addTimer(self.uploadTimer)
+
+        # Checks the WiFi link and reconnects (with backoff) when it drops
+        self.wifiTimer = SoftwareTimer("wifi", None, periodic=True)
+        self.model.addTimer(self.wifiTimer)
+
         # HUMIDITY LIMITS
         self.hum_bad_count = 0
         self.WARNING_HUM = 70
         self.ALARM_HUM   = 85
 
+        # Only post when the humidity moves, crosses a limit, or every 5 min
+        self.dal.reportOnChange("humidity", 1, (self.WARNING_HUM, self.ALARM_HUM))
+
         # Alarm flag used by _alarm_pattern
         self._alarmon = False
 
@@ -94,21 +111,16 @@ class WarehouseAlarmController:
             self.hum_bad_count = 0
             self._alarmoff()
 
-            self.display.clear()
-            self.display.showText("NORMAL SYSTEM", 0, 0)
+            self.display.showLines("NORMAL SYSTEM")
             self.light.setColor(GREEN)
 
         elif state == STATE_WARNING:
-            self.display.clear()
-            self.display.showText("WARNING", 0, 0)
-            self.display.showText("CHECK HUMIDITY", 1, 0)
+            self.display.showLines("WARNING", "CHECK HUMIDITY")
             self.light.setColor(YELLOW)
 
         elif state == STATE_ALARM:
             Log.e("!!! ALARM TRIGGERED !!!")
-            self.display.clear()
-            self.display.showText("*** ALARM ***", 0, 0)
-            self.display.showText("PRESS RESET!", 1, 0)
+            self.display.showLines("*** ALARM ***", "PRESS RESET!")
 
             self._alarmon = True
             self.light.setColor(RED)
@@ -151,7 +163,17 @@ class WarehouseAlarmController:
         # TIMER event → read sensor
         if event == "sensorpoll_timeout":
             self._read_humidity()
-            self.sensorTimer.start(10)
+            return True
+
+        # Offline queue
+        if event == "upload_timeout":
+            self.dal.flush()
+            return True
+
+        # WiFi connection manager
+        if event == "wifi_timeout":
+            if self.net.maintain():
+                self.clock.maintain()
             return True
 
         return False
@@ -161,8 +183,14 @@ class WarehouseAlarmController:
     # STATE DO (KEEP ALARM FLASHING)
     # ======================================================
     def stateDo(self, state):
+        # let background POSTs make progress, and come back soon while any are left
+        if self.net.poll():
+            self.model.wakeAfter(0.05)
+
         if state == STATE_ALARM:
             self._alarm_pattern()
+            # keep the tickless loop coming around while the alarm pattern runs
+            self.model.wakeAfter(0)
 
 
     # ======================================================
@@ -235,6 +263,14 @@ class WarehouseAlarmController:
     # ======================================================
     # HELPERS
     # ======================================================
+    def _wifiChanged(self, connected):
+        if connected:
+            self.clock.sync()
+            # send what piled up while we were offline
+            self.dal.flush()
+        else:
+            Log.e("WiFi down - readings are queued until it is back")
+
     def _alarmoff(self):
         try:
             self.buzzer.stop()
@@ -248,7 +284,10 @@ class WarehouseAlarmController:
     def run(self):
         Log.i("Starting sensor timer (10 sec)...")
         self.sensorTimer.start(10)
-        self.model.run()
+        self.uploadTimer.start(5)
+        self.wifiTimer.start(2)
+        # Sleep between deadlines instead of waking up 10 times a second
+        self.model.run(tickless=True)
 
     def stop(self):
         self.model.stop()
@@ -0,0 +1,222 @@
+"""
+# AsyncNET.py
+# A NET that sends its POSTs in the background with uasyncio, so the
+# state model loop keeps running while DNS, TLS and the HTTP round trip
+# are in progress. MicroPython only, like NET (network.WLAN, time.ticks_ms).
+"""
+
+import uasyncio as asyncio
+import time
+import ujson
+from Log import *
+from NET import NET, StaleConnection
+
+class AsyncNET(NET):
+    """
+    Same connect/isconnected/post as NET, plus postAsync which puts the
+    request on a small outbound queue and returns straight away. Up to
+    concurrency requests are in flight at a time and each one calls its
+    callback(status, body) when done (status None if it failed).
+
+    Like NET, connections are kept open (HTTP/1.1 keep-alive) - finished
+    ones wait in a small idle pool for the next request to the same host.
+
+    The asyncio scheduler only runs inside poll(), so call poll regularly
+    from the main loop - the controllers do it from stateDo. poll returns
+    True while requests are still queued or in flight, which is the cue
+    to come around again soon.
+    """
+
+    def __init__(self, ssid, password, maxqueue=4, concurrency=1, timeout=15):
+        super().__init__(ssid, password)
+        self._maxqueue = maxqueue
+        self._concurrency = concurrency
+        self.timeout = timeout
+        self._requests = []
+        self._active = 0
+        self._loop = asyncio.new_event_loop()
+        self._ready = asyncio.Event()
+        self._workers = False
+        self._idle = []         # (host, port, reader, writer) of kept connections
+
+    def pending(self):
+        """ Number of requests queued or in flight """
+
+        return len(self._requests) + self._active
+
+    def canSend(self):
+        """ True if postAsync can take another request without the outbound queue overflowing """
+
+        return len(self._requests) < self._maxqueue
+
+    def postAsync(self, url, payload, callback=None, reply=False):
+        """
+        Queue a POST of payload (as JSON) to url. Returns False, after
+        calling the callback with a failure, if the outbound queue is full.
+        """
+
+        if len(self._requests) >= self._maxqueue:
+            Log.e(f"NET: request queue full, {url} not sent")
+            if callback:
+                callback(None, None)
+            return False
+
+        self._requests.append((url, payload, callback, reply))
+        self._ready.set()
+        return None
+
+    def poll(self, ms=20):
+        """ Give the background requests up to ms milliseconds to make progress """
+
+        if self.pending() == 0:
+            return False
+
+        if not self._workers:
+            for i in range(self._concurrency):
+                self._loop.create_task(self._worker())
+            self._workers = True
+
+        self._loop.run_until_complete(asyncio.sleep(ms / 1000))
+        return self.pending() > 0
+
+    async def _worker(self):
+        while True:
+            if not self._requests:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            url, payload, callback, reply = self._requests.pop(0)
+            self._active += 1
+            Log.i(f"NET: POST {url} (background)")
+            try:
+                status, body = await asyncio.wait_for(self._request(url, payload, reply), self.timeout)
+                Log.i(f"NET: POST OK ({status})")
+            except Exception as e:
+                Log.e(f"NET: POST ERROR: {e}")
+                status, body = None, None
+            self._active -= 1
+
+            if callback:
+                try:
+                    callback(status, body)
+                except Exception as e:
+                    Log.e(f"NET: POST callback failed: {e}")
+
+    async def _request(self, url, payload, reply):
+        """
+        POST on a kept connection if there is one, reconnecting once if it
+        has died - only when the send failed or nothing came back, like NET
+        """
+
+        secure, host, port, path = self._split(url)
+        data = ujson.dumps(payload).encode()
+        for attempt in range(2):
+            conn = self._takeIdle(host, port)
+            reused = conn is not None
+            timings = {'connect': 0, 'tls': 0, 'reused': reused}
+            start = time.ticks_ms()
+            try:
+                if conn is None:
+                    # open_connection does the TCP connect and the TLS handshake in one go
+                    conn = await asyncio.open_connection(host, port, ssl=secure)
+                    timings['connect'] = time.ticks_diff(time.ticks_ms(), start)
+                status, body, keep = await self._exchangeAsync(conn, host, path, data, reply, timings)
+            except BaseException as e:
+                if conn is not None:
+                    await self._closeConn(conn)
+                if reused and isinstance(e, StaleConnection):
+                    Log.d(f"NET: kept connection failed ({e}), reconnecting")
+                    continue
+                raise
+
+            if keep:
+                self._idle.append((host, port, conn[0], conn[1]))
+            else:
+                await self._closeConn(conn)
+            timings['total'] = time.ticks_diff(time.ticks_ms(), start)
+            self.timings = timings
+            Log.d(f"NET: connect+tls {timings['connect']} ms, send {timings['send']} ms, first byte {timings['firstbyte']} ms, total {timings['total']} ms{' (kept connection)' if reused else ''}")
+            return status, body
+
+    async def _exchangeAsync(self, conn, host, path, data, reply, timings):
+        """ One HTTP/1.1 request/response, returns (status, body, connection can be kept) """
+
+        reader, writer = conn
+        mark = time.ticks_ms()
+        head = f"POST /{path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n"
+        try:
+            writer.write(head.encode() + data)
+            await writer.drain()
+        except OSError as e:
+            raise StaleConnection(f"send failed: {e}")
+        timings['send'] = time.ticks_diff(time.ticks_ms(), mark)
+
+        mark = time.ticks_ms()
+        line = await reader.readline()
+        if not line:
+            raise StaleConnection("connection closed by server")
+        timings['firstbyte'] = time.ticks_diff(time.ticks_ms(), mark)
+        status = int(line.split(None, 2)[1])
+
+        length, chunked, keep = None, False, True
+        while True:
+            line = await reader.readline()
+            if not line or line == b'\r\n':
+                break
+            name, value = self._header(line)
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding':
+                chunked = value == 'chunked'
+            elif name == 'connection':
+                keep = value != 'close'
+
+        # always read the whole body, or the next response would start in the middle of it
+        if self._noBody(status):
+            text = b''
+        elif chunked:
+            text = b''
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                text += await reader.readexactly(size)
+                await reader.readline()
+        elif length is not None:
+            text = await reader.readexactly(length)
+        else:
+            # no length - don't wait for the server to close, see NET._exchange
+            text = b''
+            keep = False
+
+        body = None
+        if reply:
+            try:
+                body = ujson.loads(text)
+            except ValueError:
+                pass
+        return status, body, keep
+
+    def _takeIdle(self, host, port):
+        for i in range(len(self._idle)):
+            if self._idle[i][0] == host and self._idle[i][1] == port:
+                entry = self._idle.pop(i)
+                return entry[2], entry[3]
+        return None
+
+    async def _closeConn(self, conn):
+        try:
+            conn[1].close()
+            await conn[1].wait_closed()
+        except Exception:
+            pass
+
+if __name__ == "__main__":
+    import secrets
+    net = AsyncNET(secrets.SSID, secrets.PASSWORD)
+    net.connect()
+    net.postAsync("http://httpbin.org/post", {"hello": "pico"}, lambda status, body: print("done", status, body), reply=True)
+    while net.poll():
+        print("main loop still running...")
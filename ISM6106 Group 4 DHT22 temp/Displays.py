@@ -59,8 +59,21 @@ class LCDDisplay(Display):
     and d4,d5,d6,d7 to pins 3,2,1 and 0:
     usage:  LCDDisplay()  # yeah those are the default so you don't need to send
     usage: LCDDisplay(rs=5, e=4, d4=3, d5=2, d6=1, d7=0) # preferred - you can see how its hooked up
+
+    The class keeps a copy of what is on the screen (a bytearray per row).
+    Everything shown is first laid into the next frame, and only the cells
+    that differ from the screen are sent - each run of changed cells with
+    a single cursor move. Showing the same text again costs nothing, and
+    showLines() replaces the whole screen without a clear command.
+
+    startScroll() scrolls text in a row without blocking - each call to
+    tick() (from stateDo or a timer) moves the rows that are due on by
+    one frame, and the other row can still be written in between.
     
     """
+
+    ROWS = 2
+    COLUMNS = 16
     
     def __init__(self, rs=5, e=4, d4=3, d5=2, d6=1, d7=0, *, sda=-1, scl=-1):
         """
@@ -96,6 +109,11 @@ class LCDDisplay(Display):
             except:
                 raise ValueError('Could not connect to display - check wiring.')
         self._working = False
+        # what is on the screen now, and the frame being built - the LcdApi constructor clears the screen
+        self._shadow = [bytearray(b' ' * LCDDisplay.COLUMNS) for _ in range(LCDDisplay.ROWS)]
+        self._frame = [bytearray(b' ' * LCDDisplay.COLUMNS) for _ in range(LCDDisplay.ROWS)]
+        # row -> [text as bytes, position, length of one pass, skip, speed in ms, next frame at (ticks_ms), loop]
+        self._scrolls = {}
 
     def reset(self):
         """ 
@@ -104,17 +122,48 @@ class LCDDisplay(Display):
         
         Log.i("LCDDisplay: reset")
         self._lcd.clear()
+        self._scrolls.clear()
+        for row in range(LCDDisplay.ROWS):
+            self._shadow[row][:] = b' ' * LCDDisplay.COLUMNS
+            self._frame[row][:] = self._shadow[row]
         self._working = False
 
     def clear(self, line=-1):
         """
-        Clear only a single line - negative to reset
+        Clear only a single line - negative to clear the whole screen.
+        Only the cells that are not blank already are overwritten, use
+        reset() to send the clear command to the display. Stops any
+        scrolling in the cleared rows
         """
 
-        if line < 0 or line > 1:
-            self.reset()
-        else:
-            self.showText(f'{" "*16}',line)
+        if self._working:
+            Log.e("LCDDisplay - Display busy")
+            return
+        for row in range(LCDDisplay.ROWS):
+            if line < 0 or line > 1 or row == line:
+                self._frame[row][:] = b' ' * LCDDisplay.COLUMNS
+                self._scrolls.pop(row, None)
+        self._flush()
+
+    def showLines(self, line0, line1=""):
+        """
+        Show a whole screen - line0 in the top row and line1 in the bottom
+        row, each padded with blanks (or cut) to the width of the display.
+        Cheaper than clear() followed by showText() as only the cells that
+        change from what is shown now are sent. Stops any scrolling
+        """
+
+        if self._working:
+            Log.e("LCDDisplay - Display busy")
+            return
+        self._working = True
+        Log.i(f"LCDDisplay - showing lines {line0} / {line1}")
+        self._scrolls.clear()
+        for row, text in enumerate((line0, line1)):
+            text = f"{text:<16}"[:LCDDisplay.COLUMNS]
+            self._place(text, row, 0)
+        self._flush()
+        self._working = False
 
     def showNumber(self, number, row=0, col=0):
         """
@@ -126,8 +175,8 @@ class LCDDisplay(Display):
             return
         self._working = True
         Log.i(f"LCDDisplay - showing number {number} at {row},{col}")
-        self._lcd.move_to(col, row)
-        self._lcd.putstr(f"{number}")
+        self._place(f"{number}", row, col)
+        self._flush()
         self._working = False
 
     def showNumbers(self, num1, num2, colon=True, row=0, col=0):
@@ -141,9 +190,9 @@ class LCDDisplay(Display):
             return
         self._working = True
         Log.i(f"LCDDisplay - showing numbers {num1}, {num2} at {row},{col}")
-        self._lcd.move_to(col, row)
         colsym = ":" if colon else " "
-        self._lcd.putstr(f"{num1}{colsym}{num2}")
+        self._place(f"{num1}{colsym}{num2}", row, col)
+        self._flush()
         self._working = False
 
     def showText(self, text, row=0, col=0):
@@ -157,8 +206,8 @@ class LCDDisplay(Display):
             return
         self._working = True
         Log.i(f"LCDDisplay - showing text {text} at {row},{col}")
-        self._lcd.move_to(col, row)
-        self._lcd.putstr(text)
+        self._place(text, row, col)
+        self._flush()
         self._working = False
 
     def addShape(self, position, shapearray):
@@ -191,23 +240,152 @@ class LCDDisplay(Display):
         higher number will be faster but may be jerky. lower will be smooth
         but slower.
 
-        I2C devices may not have best scrolling performance. Works
-        better with GPIO-driven displays
+        This one blocks until the text has scrolled off - use startScroll
+        and tick to keep the program running while it scrolls
         """
 
         if self._working:
             Log.e("LCDDisplay - Display busy")
             return
         self._working = True
-        Log.i(f"LCDDisplay - scrolling text {text} in row {row}")
-        for p in range(0,len(text)+skip, skip):
-            curst = (text+' '*(16+skip))[p:p+16]
-            for c in range(16,0,-1):
-                self._lcd.move_to(c-1, row)
-                self._lcd.putchar(curst[c-1])
-            time.sleep(speed/1000)
+        self.startScroll(text, row, speed, skip, loop=False)
+        while row in self._scrolls:
+            time.sleep(self.tick() or 0)
         self._working = False
 
+    def startScroll(self, text, row=0, speed=300, skip=1, loop=True):
+        """
+        Start scrolling text right to left in a row without blocking.
+        The first frame is shown now, after that tick() must be called
+        regularly - a new frame is shown every speed milliseconds, moved
+        on by skip characters. With loop the text goes round and round
+        (with a gap), otherwise it scrolls off once and stops.
+        Both rows can scroll at the same time, each at its own speed
+        """
+
+        Log.i(f"LCDDisplay - scrolling text {text} in row {row}")
+        row %= LCDDisplay.ROWS
+        cols = LCDDisplay.COLUMNS
+        text = bytes(ord(ch) & 0xFF for ch in text)
+        if loop:
+            text += b'   '
+            length = len(text)
+            # enough copies that a window at any position of one pass is there
+            text = text * (cols // length + 2)
+        else:
+            length = len(text) + skip
+            text += b' ' * (cols + skip)
+        self._scrolls[row] = [text, 0, length, skip, speed, time.ticks_ms(), loop]
+        self.tick()
+
+    def stopScroll(self, row=-1):
+        """
+        Stop scrolling in a row - negative for both rows. The text stays
+        where it is
+        """
+
+        if row < 0:
+            self._scrolls.clear()
+        else:
+            self._scrolls.pop(row, None)
+
+    def tick(self):
+        """
+        Show the next frame of every scrolling row that is due. Returns
+        the seconds until the next frame is due, or None when nothing is
+        scrolling - so stateDo can do
+
+            wait = self.display.tick()
+            if wait is not None:
+                self.model.wakeAfter(wait)
+        """
+
+        if not self._scrolls:
+            return None
+        now = time.ticks_ms()
+        wait = None
+        due = False
+        for row in range(LCDDisplay.ROWS):
+            scroll = self._scrolls.get(row)
+            if scroll is None:
+                continue
+            left = time.ticks_diff(scroll[5], now)
+            if left <= 0:
+                # just copy the window in - _flush only sends the cells that changed
+                pos = scroll[1]
+                self._frame[row][:] = memoryview(scroll[0])[pos:pos + LCDDisplay.COLUMNS]
+                due = True
+                pos += scroll[3]
+                if pos >= scroll[2]:
+                    if not scroll[6]:
+                        del self._scrolls[row]
+                        continue
+                    pos -= scroll[2]
+                scroll[1] = pos
+                scroll[5] = time.ticks_add(now, scroll[4])
+                left = scroll[4]
+            if wait is None or left < wait:
+                wait = left
+        if due:
+            self._flush()
+        return None if wait is None else wait / 1000
+
+    def _place(self, text, row, col):
+        """
+        Lay text into the next frame starting at row, col - wrapping into
+        the next row at the end of a line like LcdApi.putstr does
+        """
+
+        row %= LCDDisplay.ROWS
+        wrapped = False
+        for ch in text:
+            if col >= LCDDisplay.COLUMNS:
+                col = 0
+                row = (row + 1) % LCDDisplay.ROWS
+                if ch == '\n' and wrapped:
+                    # the newline right after a wrap is already done
+                    wrapped = False
+                    continue
+            wrapped = False
+            if ch == '\n':
+                col = LCDDisplay.COLUMNS
+                continue
+            self._frame[row][col] = ord(ch) & 0xFF
+            col += 1
+            wrapped = col >= LCDDisplay.COLUMNS
+
+    def _flush(self):
+        """
+        Send the cells of the next frame that differ from the screen.
+        Each run of changed cells gets one cursor move and its characters
+        are then written back to back (the display moves the cursor on by
+        itself). A single unchanged cell between two changes is written
+        again rather than paying for another cursor move
+        """
+
+        cols = LCDDisplay.COLUMNS
+        for row in range(LCDDisplay.ROWS):
+            want = self._frame[row]
+            have = self._shadow[row]
+            if want == have:
+                continue
+            col = 0
+            while col < cols:
+                if want[col] == have[col]:
+                    col += 1
+                    continue
+                end = col + 1
+                while end < cols and (want[end] != have[end] or (end + 1 < cols and want[end + 1] != have[end + 1])):
+                    end += 1
+                self._writeRun(row, col, want, end)
+                col = end
+            have[:] = want
+
+    def _writeRun(self, row, col, data, end):
+        """ Write data[col:end] to the display at row, col """
+
+        self._lcd.write_at(col, row, memoryview(data)[col:end])
+
 """
 Example usage of the LCDDisplay class
 This part is not executed when the module is imported, but can be used for testing.
@@ -222,6 +400,13 @@ if __name__ == "__main__":
         time.sleep(2)
         lcd.scroll("Scrolling Text Example", 0, speed=100, skip=2)
         time.sleep(2)
+        # non-blocking - the number in row 1 keeps changing while row 0 scrolls
+        lcd.startScroll("Scrolling without blocking", 0, speed=200)
+        for i in range(50):
+            lcd.showNumber(i, 1, 0)
+            lcd.tick()
+            time.sleep(0.1)
+        lcd.stopScroll()
         lcd.clear()
     except Exception as e:
         Log.e(f"Error: {e}")
\ No newline at end of file
@@ -1,19 +1,48 @@
 # --------------
 # NET
 # --------------
-import urequests
+import socket
+import ssl
+import ujson
 from Log import *
 import network
 import time
 import secrets
 import ntptime
 
+class StaleConnection(OSError):
+    """ A kept connection was found closed before the request got an answer - safe to send again """
+    pass
+
 class NET:
 
+    # connection states
+    DOWN = 0
+    CONNECTING = 1
+    UP = 2
+    BACKOFF = 3
+
     def __init__(self, ssid, password):
         self.ssid = ssid
         self.password = password
         self.wlan = network.WLAN(network.STA_IF)
+        self.timeout = 15
+        self.timings = {}       # how long the parts of the last post took, in ms
+        self._sock = None       # the kept connection and who it is to
+        self._stream = None
+        self._peer = None
+        self._tlssession = None
+
+        self.state = NET.DOWN
+        self.connecttimeout = 10    # seconds to wait for one connect attempt
+        self.backoffbase = 2        # first retry delay in seconds, doubles every failure
+        self.backoffmax = 300
+        self.failures = 0           # failed connects in a row
+        self.drops = 0              # times the link was lost after being up
+        self.rssi = None            # smoothed signal strength while up
+        self._retryat = 0
+        self._connectstart = 0
+        self._callback = None
 
     def sync_time(self):
         """Synchronize Pico clock using NTP (UTC time)."""
@@ -23,43 +52,306 @@ class NET:
         except Exception as e:
             Log.e(f"NET: NTP sync failed: {e}")
 
-    def connect(self):
+    # -------------- CONNECTION MANAGER ----------------
+    # DOWN -> CONNECTING -> UP, and back to BACKOFF (waiting to retry)
+    # whenever a connect fails or the link drops. Nothing here waits -
+    # maintain() moves it along and is meant to be called from a timer.
+
+    def start(self, callback=None):
+        """
+        Start connecting without waiting for it. callback(connected) is
+        called every time the link comes up (True) or goes down (False).
+        """
         Log.i("NET: activating WiFi...")
+        self._callback = callback
         self.wlan.active(True)
+        self._retryat = time.ticks_ms()
+        self.state = NET.DOWN
+        self.maintain()
 
-        attempt = 0
-        if not self.wlan.isconnected():
-            self.wlan.connect(self.ssid, self.password)
+    def connect(self):
+        """ Connect and wait for it, up to connecttimeout seconds - start() is the non-blocking way """
+        self.start()
+        while self.state == NET.CONNECTING:
+            time.sleep(0.2)
+            self.maintain()
 
-        while not self.wlan.isconnected() and attempt < 10:
-            attempt += 1
-            Log.i(f"NET: connecting... attempt {attempt}")
-            time.sleep(1)
+    def maintain(self):
+        """ One step of the connection state machine - returns True if the link is up """
 
-        if self.wlan.isconnected():
-            ip = self.wlan.ifconfig()[0]
-            Log.i(f"NET: connected, IP={ip}")
+        now = time.ticks_ms()
+        if self.state == NET.UP:
+            if self.wlan.isconnected():
+                self._trackLink()
+                return True
+            Log.e("NET: WiFi link lost")
+            self.drops += 1
+            self._close()
+            self.state = NET.BACKOFF
+            self._retryat = now
+            self._notify(False)
 
-            # <<< ADD THIS AFTER WIFI IS UP
-            self.sync_time()
+        if self.state in (NET.DOWN, NET.BACKOFF):
+            if time.ticks_diff(now, self._retryat) < 0:
+                return False
+            Log.i(f"NET: connecting to {self.ssid}...")
+            if not self.wlan.isconnected():
+                self.wlan.connect(self.ssid, self.password)
+            self._connectstart = now
+            self.state = NET.CONNECTING
 
-        else:
-            Log.e("NET: FAILED to connect!")
+        if self.state == NET.CONNECTING:
+            if self.wlan.isconnected():
+                ip = self.wlan.ifconfig()[0]
+                Log.i(f"NET: connected, IP={ip} ({time.ticks_diff(now, self._connectstart)} ms)")
+                self.state = NET.UP
+                self.failures = 0
+                self.rssi = None
+                self._trackLink()
+                self._connected()
+                self._notify(True)
+                return True
+
+            # negative status is a definite failure (wrong password, no AP...)
+            if self.wlan.status() < 0 or time.ticks_diff(now, self._connectstart) >= self.connecttimeout * 1000:
+                delay = min(self.backoffmax, self.backoffbase * (1 << min(self.failures, 10)))
+                self.failures += 1
+                Log.e(f"NET: FAILED to connect (status {self.wlan.status()}), retrying in {delay} s")
+                self.wlan.disconnect()
+                self.state = NET.BACKOFF
+                self._retryat = time.ticks_add(now, int(delay * 1000))
+        return False
+
+    def _connected(self):
+        """ Anything to do as soon as the link is up """
+        pass
+
+    def _notify(self, connected):
+        if self._callback:
+            try:
+                self._callback(connected)
+            except Exception as e:
+                Log.e(f"NET: connection callback failed: {e}")
+
+    def _trackLink(self):
+        """ Keep a smoothed signal strength (dBm) while connected """
+
+        try:
+            rssi = self.wlan.status('rssi')
+        except (ValueError, TypeError, OSError):
+            return
+        self.rssi = rssi if self.rssi is None else (self.rssi * 7 + rssi) / 8
+
+    def isconnected(self):
+        return self.wlan.isconnected()
+
+    def poll(self):
+        """ Nothing runs in the background here - see AsyncNET """
+        return False
+
+    def canSend(self):
+        """ True if postAsync can take another message now - always, it sends straight away """
+        return True
 
     # -------------- REQUIRED BY THE DAL ----------------
-    def post(self, url, payload):
-        """Send POST to APEX REST endpoint"""
+    def post(self, url, payload, reply=False):
+        """
+        Send POST to APEX REST endpoint. Returns the status code, or
+        (status, decoded JSON body) when reply is True.
+
+        The connection to the server is kept open (HTTP/1.1 keep-alive)
+        and used again for the next post to the same host. If a kept
+        connection turns out to be dead (the send fails or the server closed
+        it without answering), we reconnect and try once more. Any other
+        failure - a timeout waiting for the answer, say - is not retried, as
+        the server may already have stored the reading.
+        How long each step took ends up in self.timings.
+        """
 
         Log.i(f"NET: POST {url}")
         Log.i(f"NET: payload = {payload}")
 
+        secure, host, port, path = self._split(url)
+        data = ujson.dumps(payload).encode()
+        for attempt in range(2):
+            reused = self._sock is not None and self._peer == (host, port)
+            try:
+                status, body = self._exchange(secure, host, port, path, data, reply)
+                Log.i(f"NET: POST OK ({status})")
+                return (status, body) if reply else status
+
+            except StaleConnection as e:
+                self._close()
+                if reused:
+                    Log.d(f"NET: kept connection failed ({e}), reconnecting")
+                    continue
+                Log.e(f"NET: POST ERROR: {e}")
+                break
+
+            except Exception as e:
+                self._close()
+                Log.e(f"NET: POST ERROR: {e}")
+                break
+        return (None, None) if reply else None
+
+    def _exchange(self, secure, host, port, path, data, reply):
+        """ One request/response on the kept connection, opening it first if needed """
+
+        start = time.ticks_ms()
+        timings = {'connect': 0, 'tls': 0, 'reused': True}
+        if self._sock is None or self._peer != (host, port):
+            self._close()
+            self._open(secure, host, port, timings)
+            timings['reused'] = False
+
+        mark = time.ticks_ms()
+        head = f"POST /{path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n"
         try:
-            response = urequests.post(url, json=payload)
-            status = response.status_code
-            Log.i(f"NET: POST OK ({status})")
-            response.close()
-            return status
+            self._stream.write(head.encode() + data)
+            if hasattr(self._stream, 'flush'):
+                self._stream.flush()
+        except OSError as e:
+            raise StaleConnection(f"send failed: {e}")
+        timings['send'] = time.ticks_diff(time.ticks_ms(), mark)
 
-        except Exception as e:
-            Log.e(f"NET: POST ERROR: {e}")
-            return None
\ No newline at end of file
+        mark = time.ticks_ms()
+        line = self._stream.readline()
+        if not line:
+            raise StaleConnection("connection closed by server")
+        timings['firstbyte'] = time.ticks_diff(time.ticks_ms(), mark)
+        status = int(line.split(None, 2)[1])
+
+        length, chunked, keep = None, False, True
+        while True:
+            line = self._stream.readline()
+            if not line or line == b'\r\n':
+                break
+            name, value = self._header(line)
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding':
+                chunked = value == 'chunked'
+            elif name == 'connection':
+                keep = value != 'close'
+
+        # always read the whole body, or the next response would start in the middle of it
+        if self._noBody(status):
+            text = b''
+        elif chunked:
+            text = b''
+            while True:
+                size = int(self._stream.readline().split(b';')[0], 16)
+                if size == 0:
+                    self._stream.readline()
+                    break
+                text += self._readExactly(size)
+                self._stream.readline()
+        elif length is not None:
+            text = self._readExactly(length)
+        else:
+            # no length - the body would run until the server closes the
+            # connection, which may not happen before our timeout. Skip it
+            # and start over on a new connection next time
+            text = b''
+            keep = False
+        if not keep:
+            self._close()
+
+        timings['total'] = time.ticks_diff(time.ticks_ms(), start)
+        self.timings = timings
+        Log.d(f"NET: connect {timings['connect']} ms, tls {timings['tls']} ms, send {timings['send']} ms, first byte {timings['firstbyte']} ms, total {timings['total']} ms{' (kept connection)' if timings['reused'] else ''}")
+
+        body = None
+        if reply:
+            try:
+                body = ujson.loads(text)
+            except ValueError:
+                pass
+        return status, body
+
+    def _open(self, secure, host, port, timings):
+        mark = time.ticks_ms()
+        addr = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][-1]
+        sock = socket.socket()
+        sock.settimeout(self.timeout)
+        sock.connect(addr)
+        timings['connect'] = time.ticks_diff(time.ticks_ms(), mark)
+
+        if secure:
+            mark = time.ticks_ms()
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            if hasattr(ctx, 'check_hostname'):
+                ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE   # same as urequests on the Pico
+            if self._tlssession is not None:
+                # resume the last TLS session (only where the ssl module supports it)
+                sock = ctx.wrap_socket(sock, server_hostname=host, session=self._tlssession)
+            else:
+                sock = ctx.wrap_socket(sock, server_hostname=host)
+            self._tlssession = getattr(sock, 'session', None)
+            timings['tls'] = time.ticks_diff(time.ticks_ms(), mark)
+
+        self._sock = sock
+        # MicroPython sockets (TLS ones too) read and write lines themselves,
+        # CPython ones need a file object for that
+        self._stream = sock.makefile('rwb') if hasattr(sock, 'makefile') else sock
+        self._peer = (host, port)
+
+    def _readExactly(self, size):
+        data = b''
+        while len(data) < size:
+            more = self._stream.read(size - len(data))
+            if not more:
+                raise OSError("connection closed by server")
+            data += more
+        return data
+
+    def _close(self):
+        """ Drop the kept connection """
+
+        if self._sock is not None:
+            try:
+                if self._stream is not self._sock:
+                    self._stream.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._stream = None
+        self._peer = None
+
+    def _noBody(self, status):
+        """ True for the replies that never have a body (1xx, 204 and 304) """
+        return status < 200 or status == 204 or status == 304
+
+    def _header(self, line):
+        """ Split a response header line into a lowercase (name, value) pair """
+
+        name, _, value = line.decode().partition(':')
+        return name.strip().lower(), value.strip().lower()
+
+    def _split(self, url):
+        """ Break a url into (secure, host, port, path) """
+
+        proto, _, host, path = url.split('/', 3)
+        secure = proto == 'https:'
+        port = 443 if secure else 80
+        if ':' in host:
+            host, port = host.split(':')
+            port = int(port)
+        return secure, host, port, path
+
+    def postAsync(self, url, payload, callback=None, reply=False):
+        """
+        Same as post, but the result goes to callback(status, body).
+        This NET sends right away and waits for the answer - AsyncNET
+        overrides it to send in the background instead.
+        """
+
+        if reply:
+            status, body = self.post(url, payload, reply=True)
+        else:
+            status, body = self.post(url, payload), None
+        if callback:
+            callback(status, body)
+        return status
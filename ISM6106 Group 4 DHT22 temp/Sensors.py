@@ -8,6 +8,7 @@
 
 import utime
 import math
+from array import array
 from machine import Pin, ADC
 from Log import *
 
@@ -134,9 +135,14 @@ class AnalogSensor(Sensor):
     that can be read in using an ADC. Pico reads in via a 16bit unsigned
 
     Since analog sensors do not have a handler, you need to poll
-    the rawValue() method to get its value. The tripped method takes
-    3 readings and takes the average. If the average is higher/lower
-    than the threshold it will return true.
+    the rawValue() method to get its value. The sensor keeps a rolling
+    buffer of the last few readings - call sample() regularly (the
+    StateModel does this for sensors added to it) and tripped() just
+    compares the running average with the threshold, without waiting.
+    If the average is higher/lower than the threshold it will return true.
+
+    Pass blocking=True to get the old behaviour instead, where tripped takes
+    3 readings 0.1 sec apart and averages them.
     
     Most analog sensors such as LDRs and thermistors will require
     a 10K pull-up resistor to the 3.3V rail. For better results,
@@ -148,24 +154,74 @@ class AnalogSensor(Sensor):
     your application.
     """
     
-    def __init__(self, pin, name='Analog Sensor', lowActive=True, threshold = 30000):
-        """ analog sensors will need to be sent a threshold value to detect trip """
+    def __init__(self, pin, name='Analog Sensor', lowActive=True, threshold = 30000, blocking=False, samples=3):
+        """
+        analog sensors will need to be sent a threshold value to detect trip
+        samples is the size of the rolling buffer used for the average
+        """
         
         super().__init__(name, lowActive)
         self._pinio = ADC(pin)
         self._threshold = threshold
+        self._blocking = blocking
+        self._samples = array('f', [0] * samples)
+        self._sampleIndex = 0
+        self._sampleCount = 0
+        self._sampleTotal = 0.0
+        self._fed = False          # a sample() was taken since the average was last read
+
+    def sample(self):
+        """
+        Take one reading into the rolling buffer. Meant to be called
+        regularly from the main loop or a timer.
+        """
+
+        v = self.rawValue()
+        i = self._sampleIndex
+        self._sampleTotal += v - self._samples[i]
+        self._samples[i] = v
+        i += 1
+        if i == len(self._samples):
+            i = 0
+            # re-add from the buffer once per round so rounding errors cannot build up
+            total = 0.0
+            for x in self._samples:
+                total += x
+            self._sampleTotal = total
+        self._sampleIndex = i
+        if self._sampleCount < len(self._samples):
+            self._sampleCount += 1
+        self._fed = True
+
+    def average(self):
+        """
+        The average of the readings in the rolling buffer. Takes one
+        reading first (without waiting) if nothing has called sample()
+        since the last time, so a sensor nobody polls is still read.
+        """
+
+        if not self._fed:
+            self.sample()
+        self._fed = False
+        return self._sampleTotal / self._sampleCount
+
+    def _blockingAverage(self):
+        """ Take 3 measurements 0.1 sec apart and return the average """
 
-    def tripped(self)->bool:
-        """ sensor is tripped if sensor value is higher or lower than threshold """
-        
-        # Take 3 measurements after 0.1 sec to get an average
         v1 = self.rawValue()
         utime.sleep(0.1)
         v2 = self.rawValue()
         utime.sleep(0.1)
         v3 = self.rawValue()
+        return (v1 + v2 + v3) / 3
+
+    def tripped(self)->bool:
+        """ sensor is tripped if sensor value is higher or lower than threshold """
         
-        v = (v1 + v2 + v3) / 3
+        if self._blocking:
+            v = self._blockingAverage()
+        else:
+            v = self.average()
         
         if (self._lowActive and v < self._threshold) or (not self._lowActive and v > self._threshold):
             Log.i(f"AnalogSensor {self._name}: sensor tripped")
@@ -201,7 +257,7 @@ class Thermistor(AnalogSensor, TemperatureSensor):
     which is then converted to temperature using the Steinhart-Hart equation.
     """
     
-    def __init__(self, pin, name='Thermistor', lowActive=False, threshold=30, Vd=3.3, Rp=10, Rt=10, beta=3950):
+    def __init__(self, pin, name='Thermistor', lowActive=False, threshold=30, Vd=3.3, Rp=10, Rt=10, beta=3950, blocking=False):
         """
         Create a new temp sensor - similar to regular analog sensor
         but now tripped will return true when temp is lower than threshold (lowActive=True)
@@ -214,12 +270,14 @@ class Thermistor(AnalogSensor, TemperatureSensor):
             Rp value of pullup resistor in K-ohms defaults to 10k
             Rt value of thermistor resistance (10k typical for 10k thermistors)
             beta - thermistor beta constant - update if different
+            blocking - set to True to have temperature and tripped take their own
+                3 readings instead of using the rolling buffer filled by sample()
         """
         self.vd = Vd
         self.rt = Rt
         self.rp = Rp
         self.beta = beta
-        AnalogSensor.__init__(self, pin, name, lowActive, threshold)
+        AnalogSensor.__init__(self, pin, name, lowActive, threshold, blocking)
         
     def rawValue(self):
         """
@@ -234,15 +292,12 @@ class Thermistor(AnalogSensor, TemperatureSensor):
         return tempC
     
     def temperature(self, unit='C'):
-        """ Return the measured temperature averaged from 3 readings """
-        # Take 3 measurements after 0.1 sec to get an average
-        v1 = self.rawValue()
-        utime.sleep(0.1)
-        v2 = self.rawValue()
-        utime.sleep(0.1)
-        v3 = self.rawValue()
+        """ Return the measured temperature averaged from the rolling buffer (or 3 fresh readings if blocking) """
         
-        v = (v1 + v2 + v3) / 3
+        if self._blocking:
+            v = self._blockingAverage()
+        else:
+            v = self.average()
         
         if unit == 'C':
             return v
@@ -1,4 +1,5 @@
 import dht
+import ujson
 from collections import namedtuple
 from Sensors import *
 
@@ -88,11 +89,45 @@ class GasSensor(Sensor):
     calculations. The calibration is done using the clean air factor of the sensor.
     The gas concentration is calculated using the resistance ratio of the sensor
     and the gas curves provided in the MQ2 datasheet.
+
+    The calibrated Ro is saved to a small file on flash together with the sensor id
+    and the time of calibration, so the next boot can skip the clean air calibration.
+    The RTC starts at the same date on every boot, so the time is only trusted once
+    the clock (a TimeService) has been synced from NTP.
     """
 
-    def __init__(self, pin, name='GasSensor', lowActive=False, threshold = 0.3, baseVoltage=3.3):
+    # Drift check - a clean air reading this far above the calibrated clean air
+    # ratio means Ro is out of date. Readings below it could be gas, so they never
+    # trigger a recalibration.
+    DRIFT_TOLERANCE = 0.3
+
+    # Saved calibrations of an older format are ignored. Version 1 (no 'v')
+    # averaged one reading too many, giving an Ro 1.2 times too high
+    CACHE_VERSION = 2
+
+    def __init__(self, pin, name='GasSensor', lowActive=False, threshold = 0.3, baseVoltage=3.3, background=False, lookup=False,
+                 cachefile='mq2_cal.json', maxage=7*24*3600, clock=None):
         """
         Initialize the Gas sensor with the given pin, name, lowActive and threshold.
+
+        With background=True the sensor never blocks on a reading. Call sample()
+        regularly (every half second or more often) and all readings come from the
+        Rs averaged over the last complete sampling window.
+
+        With lookup=True the gas curves are precomputed into lookup tables at
+        calibration time, and readAll interpolates them instead of using log/exp.
+
+        cachefile is where the calibration is kept (None to always calibrate), and
+        maxage is how many seconds a saved calibration is trusted. A saved calibration
+        for this sensor is used right away. In background mode a stale one is used until
+        the first sampling window is complete and then replaced from that window, and a
+        fresh one is checked for drift against that window. Without background
+        sampling a stale calibration is redone at once.
+
+        clock is the TimeService that dates the saved calibration. A calibration saved
+        before the clock was synced is stale. One whose age can't be told yet (the
+        clock is not synced at boot) is checked for drift against the first background
+        window, or redone at once without background sampling.
         """
         super().__init__(name, lowActive)
         self._threshold = threshold
@@ -101,8 +136,85 @@ class GasSensor(Sensor):
         except ImportError:
             Log.e("mq2 module not found. Please ensure mq2.py is available.")
             raise
-        self._mq2 = MQ2(pin, baseVoltage=baseVoltage)
-        self._mq2.calibrate()
+        strategy = MQ2.STRATEGY_BACKGROUND if background else MQ2.STRATEGY_ACCURATE
+        self._mq2 = MQ2(pin, baseVoltage=baseVoltage, measuringStrategy=strategy, lookup=lookup)
+        self._background = background
+        self._cachefile = cachefile
+        self._clock = clock
+        self._sensorid = f'{name}:{pin}'
+        # What to do with the first complete background window: None, 'check' or 'recalibrate'
+        self._pending = None
+
+        cal = self._loadCalibration(maxage)
+        if cal == 'fresh' or (cal == 'unknown' and background):
+            self._pending = 'check' if background else None
+        elif cal == 'stale' and background:
+            self._pending = 'recalibrate'
+        else:
+            self._mq2.calibrate()
+            self._saveCalibration()
+
+    def _loadCalibration(self, maxage):
+        """
+        Load a saved Ro for this sensor. Returns 'fresh', 'stale' or 'unknown'
+        (its age can't be told yet) if one was loaded, or None if there is no
+        usable saved calibration.
+        """
+        if self._cachefile is None:
+            return None
+        try:
+            with open(self._cachefile) as f:
+                cal = ujson.load(f)
+        except (OSError, ValueError):
+            return None
+        if cal.get('v') != self.CACHE_VERSION or cal.get('id') != self._sensorid or cal.get('ro', 0) <= 0:
+            return None
+        self._mq2.calibrate(cal['ro'])
+        ts = cal.get('ts')
+        if ts is None:
+            Log.i(f"GasSensor {self._name}: using saved calibration Ro={cal['ro']} (saved before the clock was set)")
+            return 'stale'
+        if self._clock is None or not self._clock.synced:
+            Log.i(f"GasSensor {self._name}: using saved calibration Ro={cal['ro']} (age unknown)")
+            return 'unknown'
+        age = self._clock.now() - ts
+        Log.i(f"GasSensor {self._name}: using saved calibration Ro={cal['ro']} ({age} sec old)")
+        return 'fresh' if 0 <= age <= maxage else 'stale'
+
+    def _saveCalibration(self):
+        """ Save the current Ro with the sensor id and a timestamp (None while the clock is not synced) """
+        if self._cachefile is None:
+            return
+        ts = self._clock.now() if self._clock is not None and self._clock.synced else None
+        try:
+            with open(self._cachefile, 'w') as f:
+                ujson.dump({'v': self.CACHE_VERSION, 'id': self._sensorid, 'ro': self._mq2._ro, 'ts': ts}, f)
+        except OSError as e:
+            Log.e(f"GasSensor {self._name}: could not save calibration: {e}")
+
+    def sample(self):
+        """
+        Take one background sample if one is due. Returns True when a new
+        averaged reading is available. Only needed with background=True.
+
+        The first complete window is also used to finish a pending drift check
+        or background recalibration.
+        """
+        published = self._mq2.sample()
+        if published and self._pending is not None:
+            rs = self._mq2.cachedRs()
+            cleanair = self._mq2.getRoInCleanAir()
+            if self._pending == 'check':
+                drift = (rs / self._mq2._ro - cleanair) / cleanair
+                if drift > self.DRIFT_TOLERANCE:
+                    Log.i(f"GasSensor {self._name}: calibration drifted by {drift:.2f}, recalibrating")
+                    self._pending = 'recalibrate'
+            if self._pending == 'recalibrate':
+                self._mq2.calibrate(rs / cleanair)
+                self._saveCalibration()
+                Log.i(f"GasSensor {self._name}: recalibrated in background, Ro={self._mq2._ro}")
+            self._pending = None
+        return published
     
     def rawValue(self):
         """
@@ -116,15 +228,25 @@ class GasSensor(Sensor):
         """
         return self.rawValue() < self._threshold if self._lowActive else self.rawValue() >= self._threshold
     
+    def readAll(self):
+        """
+        Return all gas concentrations in ppm from a single sensor reading, as the
+        array returned by MQ2.readAll (index it with MQ2.LPG, MQ2.SMOKE, MQ2.HYDROGEN
+        and MQ2.METHANE). The array is reused by the next call.
+        """
+        return self._mq2.readAll()
+
     def getGasConcentrations(self):
         """
         Return a dictionary of gas concentrations in ppm for various gases.
         """
+        mq2 = self._mq2
+        values = mq2.readAll()
         concentrations = {
-            'LPG': self._mq2.readLPG(), 
-            'Smoke': self._mq2.readSmoke(), 
-            'Hydrogen': self._mq2.readHydrogen(), 
-            'Methane': self._mq2.readMethane()
+            'LPG': values[mq2.LPG], 
+            'Smoke': values[mq2.SMOKE], 
+            'Hydrogen': values[mq2.HYDROGEN], 
+            'Methane': values[mq2.METHANE]
             }
         return concentrations
 
@@ -4,8 +4,11 @@
 # Author: Arijit Sengupta
 """
 import time
+from array import array
+from machine import disable_irq, enable_irq, idle
 from Log import *
-from Sensors import DigitalSensor
+from Sensors import DigitalSensor, AnalogSensor
+from Counters import SoftwareTimer, TimerService
 
 class StateModel:
     """
@@ -64,9 +67,23 @@ class StateModel:
 
     As events start coming in, call processEvent on the event to
     have the state model transition as per the transition matrix.
+
+    Every event also gets an integer id when it is registered - addButton,
+    addTimer, addSensor and addCustomEvent return the ids. processEventId(id)
+    is the fast path that skips the name lookup and does not allocate, so it is
+    the one to use from timing sensitive code. "no_event" is always id 0
+    (StateModel.NO_EVENT). Handlers still receive the event names.
+
+    Button, sensor and timer callbacks may come in from an interrupt, so they do
+    not run the handler themselves. They only put the event id in a small
+    preallocated ring buffer, and the run loop processes the queued events in the
+    order they came in. If you drive the model without calling run, call
+    processQueue from your own loop.
     """
+
+    NO_EVENT = 0
     
-    def __init__(self, numstates, handler, debug=False):
+    def __init__(self, numstates, handler, debug=False, queuesize=16):
         """
         The statemodel constructor - needs 2 things minimum:
         Parameters
@@ -80,6 +97,9 @@ class StateModel:
         all continuous in-state actions must be implemented in the handler in a execute loop.
         
         debug will print things to the screen like active state, transitions, events, etc.
+
+        queuesize is the number of events that can wait in the event queue. One slot is
+        always left empty, so it holds queuesize-1 events.
         """
         
         self._numstates = numstates
@@ -87,16 +107,39 @@ class StateModel:
         self._transitions = []
         for i in range(0, numstates):
             self._transitions.append(None)
+        # Compiled version of the transitions - one dict per source state
+        # mapping event id -> destination, so lookups do not scan the table
+        self._lookup = [None] * numstates
         self._curState = -1
         self._handler = handler
         self._debug = debug
+        # The position of an event in this list is its id
         self._events = ['no_event']
+        # event name -> event id, so membership checks are O(1)
+        self._eventids = {'no_event': StateModel.NO_EVENT}
+        # Precomputed ids for the callbacks so they don't need to build event names
+        # button name -> (press id, release id), timer name -> timeout id,
+        # sensor name -> (trip id, untrip id)
+        self._buttonEvents = {}
+        self._timerEvents = {}
+        self._sensorEvents = {}
         self._buttons = []
         self._timers = []
+        # Software timers are handed to the timer service, which only fires the expired ones
+        self._timerService = TimerService()
         # Keep a list of sensors and their current status
         # Digital sensors don't keep track of current status but we need them
-        # for non-digital sensors. So each item is a tuple (sensor, status)
+        # for non-digital sensors. So each item is a list [sensor, status, trip id, untrip id]
         self._sensors = [] # NEW - add a list for sensors that should be polled
+        # Ring buffer of event ids waiting to be processed. The interrupt side
+        # only moves the tail and the run loop only moves the head.
+        self._queue = array('H', [0] * queuesize)
+        self._qsize = queuesize
+        self._qhead = 0
+        self._qtail = 0
+        self._qdropped = 0
+        # Set by wakeAfter - when a tickless run loop must come around again
+        self._wakeat = None
 
     def addTransition(self, fromState, events, toState):
         """
@@ -107,10 +150,15 @@ class StateModel:
         """
 
         for event in events:
-            if event in self._events:
+            if event in self._eventids:
                 if not self._transitions[fromState]:
                     self._transitions[fromState] = []
+                    self._lookup[fromState] = {}
                 self._transitions[fromState].append((event,toState))
+                # the first transition added for an event wins, same as the linear scan did
+                eventid = self._eventids[event]
+                if eventid not in self._lookup[fromState]:
+                    self._lookup[fromState][eventid] = toState
             else:
                 raise ValueError(f"Invalid event {event}")
             
@@ -141,19 +189,38 @@ class StateModel:
         # Check if the events are valid
         for row in transitions:
             for (e,s) in row:
-                if e not in self._events:
+                if e not in self._eventids:
                     raise ValueError(f"Invalid event {e}")
 
         self._transitions = transitions
+        self._compileTransitions()
+
+    def _compileTransitions(self):
+        """
+        Rebuild the per-state lookup dicts from the transition table.
+        Called whenever the whole table is replaced.
+        """
+
+        self._lookup = []
+        for row in self._transitions:
+            if row:
+                table = {}
+                for (e,s) in row:
+                    eventid = self._eventids[e]
+                    if eventid not in table:
+                        table[eventid] = s
+                self._lookup.append(table)
+            else:
+                self._lookup.append(None)
 
     def getTransition(self, fromState, event):
         """
         Get the distination for this transition
         """
-        if self._transitions[fromState]:
-            for (e,s) in self._transitions[fromState]:
-                if e == event:
-                    return s
+        eventid = self._eventids.get(event, -1)
+        table = self._lookup[fromState]
+        if table:
+            return table.get(eventid, -1)
         return -1
         
     
@@ -175,12 +242,13 @@ class StateModel:
         self._running = False
         for b in self._buttons:
             b.setHandler(None)
-        for (s, status) in self._sensors:
+        for (s, status, tripid, untripid) in self._sensors:
             if isinstance(s, DigitalSensor):
                 s.setHandler(None)
         for t in self._timers:
             t.setHandler(None)
             t.cancel()
+        self._qhead = self._qtail
         self._curState = -1
 
     def gotoState(self, newState, event="no_event"):
@@ -207,85 +275,227 @@ class StateModel:
         
         I may try to improve this design a bit in the future, but for now this is how it is
         built.
+
+        The event can be given by name or by the integer id returned when it was added.
         """
         
-        if (event in self._events):
-            
-            newstate = self.getTransition(self._curState, event)
-            if newstate >= 0:
-                if self._debug:
-                    Log.d(f"Processing event {event}")
-                self.gotoState(newstate, event)
-            else:
-                if self._debug:
-                    if event != "no_event":
-                        if not self._handler.stateEvent(self._curState, event):
-                            Log.d(f"Ignoring event {event}")                    
+        if type(event) is int:
+            self.processEventId(event)
+        elif (event in self._eventids):
+            self.processEventId(self._eventids[event])
         else:
             raise ValueError(f"Invalid event {event}")
 
-    def run(self, delay=0.1):        
+    def processEventId(self, eventid):
+        """
+        Fast path of processEvent for an integer event id. The id is used directly
+        to index the compiled transition table, and the handler gets the event name
+        that was stored when the event was added, so nothing is allocated here
+        unless debug is on.
+        """
+
+        if eventid < 0 or eventid >= len(self._events):
+            raise ValueError(f"Invalid event id {eventid}")
+
+        table = self._lookup[self._curState]
+        newstate = table.get(eventid, -1) if table else -1
+        event = self._events[eventid]
+        if newstate >= 0:
+            if self._debug:
+                Log.d(f"Processing event {event}")
+            self.gotoState(newstate, event)
+        else:
+            if self._debug:
+                if eventid != StateModel.NO_EVENT:
+                    if not self._handler.stateEvent(self._curState, event):
+                        Log.d(f"Ignoring event {event}")                    
+
+    def queueEventId(self, eventid):
+        """
+        Put an event id in the event queue to be processed later by the run loop.
+        Safe to call from an interrupt handler - it does not allocate and does
+        not call the handler. If the queue is full the event is dropped and
+        counted, and the run loop reports it.
+        """
+
+        irqstate = disable_irq()
+        tail = self._qtail
+        nexttail = tail + 1
+        if nexttail == self._qsize:
+            nexttail = 0
+        if nexttail == self._qhead:
+            self._qdropped += 1
+        else:
+            self._queue[tail] = eventid
+            self._qtail = nexttail
+        enable_irq(irqstate)
+
+    def processQueue(self):
+        """
+        Process all the events waiting in the event queue, oldest first.
+        Called from the run loop. Stops early if the model was stopped by one
+        of the events.
+        """
+
+        if self._qdropped:
+            Log.e(f"StateModel: event queue full, dropped {self._qdropped} events")
+            self._qdropped = 0
+        while self._running and self._qhead != self._qtail:
+            eventid = self._queue[self._qhead]
+            head = self._qhead + 1
+            self._qhead = 0 if head == self._qsize else head
+            self.processEventId(eventid)
+
+    def eventId(self, event):
+        """
+        Return the integer id of an event name, or -1 if there is no such event.
+        Useful for custom events added in another class (like the transitions
+        helper), so the controller can look the id up once and keep it.
+        """
+
+        return self._eventids.get(event, -1)
+
+    def run(self, delay=0.1, tickless=False, sensorpoll=1.0):
+        """
+        Start the model and keep running it until stop is called.
+
+        By default the loop wakes up every delay seconds, polls the timers and
+        analog sensors and processes no_event.
+
+        With tickless=True the loop instead works out the next deadline - the
+        earliest software timer expiry, the next analog sensor poll (every
+        sensorpoll seconds) or a wake up requested by the handler through
+        wakeAfter - and idles the CPU until then, or until an interrupt puts an
+        event in the queue. Handlers that need stateDo to keep running (for example
+        to blink an alarm) should call wakeAfter from stateDo.
+        """
+
         # Start the model first
         self.start()
+        nextpoll = time.ticks_ms()
         # Then it should do a continous loop while the model runs
         while self._running:
             # Inside, you can use if statements do handle various do/actions
             # that you need to perform for each state
             # Do not perform entry and exit actions here - those are separate
-                        
+            self._wakeat = None
             self._handler.stateDo(self._curState)
 
-            # Ping any software timer in the model
-            for timer in self._timers:
-                if type(timer).__name__ == 'SoftwareTimer':
-                    timer.check()
+            # Fire any software timer in the model that is due
+            self._timerService.check()
 
-            for (sensor, status) in self._sensors:
-                if isinstance(sensor, DigitalSensor):
-                    pass # Digital sensors will call the handler when tripped/untripped
-                else:
-                    # For analog sensors, there is no handler so we need to check their value manually
-                    if sensor.tripped():
-                        if not status:
-                            # Sensor was untripped, now tripped
-                            index = self._sensors.index((sensor, status))
-                            self._sensors[index] = (sensor, True)
-                            self.processEvent(f'{sensor._name}_trip')
-                    else:
-                        if status:
-                            # Sensor was tripped, now untripped
-                            index = self._sensors.index((sensor, status))
-                            self._sensors[index] = (sensor, False)
-                            self.processEvent(f'{sensor._name}_untrip')
+            if not tickless:
+                self._pollSensors()
+            elif time.ticks_diff(time.ticks_ms(), nextpoll) >= 0:
+                self._pollSensors()
+                nextpoll = time.ticks_add(time.ticks_ms(), int(sensorpoll * 1000))
 
+            # Now handle everything that came in from the buttons, sensors and timers
+            self.processQueue()
+
+            if tickless:
+                self._sleepUntilDeadline(nextpoll if self._hasAnalogSensors() else None)
             # I suggest putting in a short wait so you are not overloading the poor Pico
-            if delay > 0:
+            elif delay > 0:
                 time.sleep(delay)
 
             # If there is any no_event transition, lets process that now
-            self.processEvent("no_event")
+            self.processEventId(StateModel.NO_EVENT)
+
+    def wakeAfter(self, seconds):
+        """
+        Ask a tickless run loop to come around again within the given number of
+        seconds (0 means right away). Only holds for the current pass of the loop,
+        so call it again from stateDo for as long as you need it.
+        """
+
+        wakeat = time.ticks_add(time.ticks_ms(), int(seconds * 1000))
+        if self._wakeat is None or time.ticks_diff(wakeat, self._wakeat) < 0:
+            self._wakeat = wakeat
 
+    def _pollSensors(self):
+        """ Check the analog sensors and queue a trip/untrip event when they change """
+
+        for entry in self._sensors:
+            sensor = entry[0]
+            if isinstance(sensor, DigitalSensor):
+                pass # Digital sensors will call the handler when tripped/untripped
+            else:
+                # For analog sensors, there is no handler so we need to check their value manually
+                if isinstance(sensor, AnalogSensor):
+                    sensor.sample() # one reading into the rolling average, tripped() won't wait
+                if sensor.tripped():
+                    if not entry[1]:
+                        # Sensor was untripped, now tripped
+                        entry[1] = True
+                        self.queueEventId(entry[2])
+                else:
+                    if entry[1]:
+                        # Sensor was tripped, now untripped
+                        entry[1] = False
+                        self.queueEventId(entry[3])
+
+    def _hasAnalogSensors(self):
+        for entry in self._sensors:
+            if not isinstance(entry[0], DigitalSensor):
+                return True
+        return False
+
+    def _sleepUntilDeadline(self, deadline):
+        """
+        Idle until the earliest of deadline (a ticks_ms value, or None), the next
+        software timer expiry and any wakeAfter request, or until an event shows
+        up in the queue. machine.idle gates the CPU clock until the next interrupt,
+        so the loop does no work while waiting.
+        """
+
+        # A state with a no_event transition should move on right away
+        table = self._lookup[self._curState]
+        if table and StateModel.NO_EVENT in table:
+            return
+
+        now = time.ticks_ms()
+        if self._wakeat is not None:
+            if deadline is None or time.ticks_diff(self._wakeat, deadline) < 0:
+                deadline = self._wakeat
+        remaining = self._timerService.remaining()
+        if remaining >= 0:
+            expiry = time.ticks_add(now, remaining)
+            if deadline is None or time.ticks_diff(expiry, deadline) < 0:
+                deadline = expiry
+
+        while self._running and self._qhead == self._qtail:
+            if deadline is not None and time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                break
+            idle()
 
     def addButton(self, btn):
+        """
+        Add a button to the state model. Returns the tuple
+        (press event id, release event id).
+        """
+
         btnname = btn._name
         event1 = f'{btnname}_press'
         event2 = f'{btnname}_release'
         
-        if event1 in self._events or event2 in self._events:
+        if event1 in self._eventids or event2 in self._eventids:
             raise ValueError(f'There is already a button with the name {btnname}')
         else:
-            self._events.append(event1)
-            self._events.append(event2)
+            ids = (self._addEvent(event1), self._addEvent(event2))
+            self._buttonEvents[btnname] = ids
             btn.setHandler(self)
-            self._buttons.append(btn)            
+            self._buttons.append(btn)
+            return ids
 
     def buttonPressed(self, name):
         """ 
         The internal button handler - now Model can take care of buttons
         that have been added using the addButton method.
+        Called from the button interrupt, so the event is only queued.
         """
 
-        self.processEvent(f'{name}_press')
+        self.queueEventId(self._buttonEvents[name][0])
 
     def buttonReleased(self, name):
         """
@@ -293,49 +503,56 @@ class StateModel:
         As well as press or just want to do release events only.
         """
 
-        self.processEvent(f'{name}_release')
+        self.queueEventId(self._buttonEvents[name][1])
         
     def addTimer(self, timer):
         """
         Add a timer to the state model. All timers must have distinct names
         Exception will be raised if a timer with the same name is added.
+        Returns the id of the timeout event.
         """
         
         eventname = f'{timer._name}_timeout'
-        if eventname in self._events:
+        if eventname in self._eventids:
             raise ValueError(f'A timer with name {timer._name} already exists')
         else:
-            self._events.append(eventname)
+            eventid = self._addEvent(eventname)
+            self._timerEvents[timer._name] = eventid
             timer.setHandler(self)
             self._timers.append(timer)
+            if isinstance(timer, SoftwareTimer):
+                self._timerService.add(timer)
+            return eventid
 
     def timeout(self, name):
         """
         Internal event handler for any timeouts received from timers
         added to the model. Will cause the timername_timeout event
-        to be processed by the transition table
+        to be processed by the transition table. Hardware timers call this
+        from an interrupt, so the event is only queued.
         """
         
-        eventname = f'{name}_timeout'
-        self.processEvent(eventname)
+        self.queueEventId(self._timerEvents[name])
 
     def addSensor(self, sensor):
         """
         Add a sensor to the state model. All sensors must have distinct names
         Exception will be raised if a sensor with the same name is added.
+        Returns the tuple (trip event id, untrip event id).
         """
 
         event1 = f'{sensor._name}_trip'
         event2 = f'{sensor._name}_untrip'
-        if event1 in self._events or event2 in self._events:
+        if event1 in self._eventids or event2 in self._eventids:
             raise ValueError(f'A sensor with name {sensor._name} already exists')
         else:
-            self._events.append(event1)
-            self._events.append(event2)
+            ids = (self._addEvent(event1), self._addEvent(event2))
+            self._sensorEvents[sensor._name] = ids
             # Check if sensor is instance of DigitalSensor
             if isinstance(sensor, DigitalSensor):
                 sensor.setHandler(self)
-            self._sensors.append((sensor, False))
+            self._sensors.append([sensor, False, ids[0], ids[1]])
+            return ids
 
     def sensorTripped(self, name):
         """
@@ -344,8 +561,7 @@ class StateModel:
         to be processed by the transition table
         """
 
-        eventname = f'{name}_trip'
-        self.processEvent(eventname)
+        self.queueEventId(self._sensorEvents[name][0])
 
     def sensorUntripped(self, name):
         """
@@ -354,8 +570,7 @@ class StateModel:
         to be processed by the transition table
         """
 
-        eventname = f'{name}_untrip'
-        self.processEvent(eventname)
+        self.queueEventId(self._sensorEvents[name][1])
 
     def addCustomEvent(self, event):
         """
@@ -365,11 +580,18 @@ class StateModel:
         transition based on the event.
 
         All events must have distinct names. Exception will be raised if the
-        event already exists.
+        event already exists. Returns the id of the new event.
         """
         
-        if event in self._events:
+        if event in self._eventids:
             raise ValueError(f'An event with the name {event} already exists')
         else:
-            self._events.append(event)
-        
+            return self._addEvent(event)
+
+    def _addEvent(self, event):
+        """ Register a new event name and return its id """
+
+        eventid = len(self._events)
+        self._events.append(event)
+        self._eventids[event] = eventid
+        return eventid
@@ -196,12 +196,22 @@ class SoftwareTimer(BaseTimer):
     again implements a handler method, but will need to poll the timer using the
     check method at regular intervals. Check will not return anything, but will
     call the timeout function of the caller just like the hardware timer.
+
+    Instead of polling every timer, the timer can be added to a TimerService
+    which keeps the timers ordered by expiry and only fires the ones that are due.
+
+    A periodic timer restarts itself with the same number of seconds every time
+    it goes off, until it is cancelled.
     """
     
-    def __init__(self, name='Software Timer', handler=None):
+    def __init__(self, name='Software Timer', handler=None, periodic=False):
         super().__init__(name, handler)
         self._starttime = 0
         self._started = False
+        self._periodic = periodic
+        # Set when the timer is owned by a TimerService
+        self._service = None
+        self._entry = None
 
     def start(self, seconds):
         """ Start the timer with a set number of seconds """
@@ -210,6 +220,8 @@ class SoftwareTimer(BaseTimer):
         self._count = seconds
         self._starttime = time.ticks_ms()
         self._started = True
+        if self._service is not None:
+            self._service._schedule(self)
 
     def cancel(self):
         """ Cancel the timer - timeout hander will NOT be called """
@@ -217,18 +229,172 @@ class SoftwareTimer(BaseTimer):
         if self._started:
             self._starttime = 0
             Log.i(f"{self._count} sec timer cancelled")
+        if self._service is not None:
+            self._service._unschedule(self)
+        self._entry = None
         super().cancel()
 
     def check(self):
         """
         Periodically call the check method - can be called from anywhere
+        Timers owned by a TimerService are checked by the service instead.
         """
         
-        if self._started and time.ticks_diff(time.ticks_ms(), self._starttime) > self._count * 1000:
+        if self._service is None and self._started and time.ticks_diff(time.ticks_ms(), self._starttime) > self._count * 1000:
             Log.i(f"{self._name}: {self._count} sec timer is up")
+            self._expired()
+
+    def remaining(self):
+        """
+        Return the number of ms until the timer goes off (0 if it is already due),
+        or -1 if the timer is not running. Lets a scheduler sleep until the timer
+        instead of polling it.
+        """
+
+        if not self._started:
+            return -1
+        left = int(self._count * 1000) - time.ticks_diff(time.ticks_ms(), self._starttime) + 1
+        return left if left > 0 else 0
+
+    def _expired(self):
+        """ The timer is up - restart it if periodic, then call the handler """
+
+        if self._periodic:
+            # Next period counts from when this one was due, so it does not drift,
+            # unless we are already more than a period late
+            now = time.ticks_ms()
+            period = int(self._count * 1000)
+            self._starttime = time.ticks_add(self._starttime, period)
+            if time.ticks_diff(now, self._starttime) > period:
+                self._starttime = now
+            if self._service is not None:
+                self._service._schedule(self)
+        else:
             self._started = False
             self._count = 0
-            self._handler.timeout(self._name)
+        self._handler.timeout(self._name)
+
+class TimerService:
+    """
+    Owns a set of SoftwareTimers and keeps the running ones in a min-heap ordered
+    by expiry time. check() only looks at the top of the heap, so each call costs
+    O(expired timers) instead of checking every timer. remaining() gives the time
+    until the next expiry, which a scheduler can use to sleep.
+
+    Every running timer has exactly one heap entry, which remembers its place in
+    the heap. Restarting a timer moves its entry and cancelling it takes the entry
+    out, so the heap never holds more entries than there are timers.
+
+    Deadlines are ticks_ms values, so they are always compared with ticks_diff to
+    survive the tick counter wrapping around.
+    """
+
+    def __init__(self, name='Timer Service'):
+        self._name = name
+        self._timers = []
+        # heap of [deadline, timer, position in the heap] entries
+        self._heap = []
+
+    def add(self, timer):
+        """ Let the service own a SoftwareTimer. A running timer is scheduled right away. """
+
+        timer._service = self
+        self._timers.append(timer)
+        if timer._started:
+            self._schedule(timer)
+
+    def remove(self, timer):
+        """ Give the timer back - it will need to be polled with check again """
+
+        if timer in self._timers:
+            self._timers.remove(timer)
+        self._unschedule(timer)
+        timer._service = None
+
+    def check(self):
+        """ Fire every timer whose deadline has passed """
+
+        now = time.ticks_ms()
+        heap = self._heap
+        while heap:
+            entry = heap[0]
+            if time.ticks_diff(now, entry[0]) < 0:
+                break
+            timer = entry[1]
+            self._unschedule(timer)
+            Log.i(f"{timer._name}: {timer._count} sec timer is up")
+            timer._expired()
+
+    def remaining(self):
+        """ ms until the next timer goes off (0 if one is due), or -1 if none are running """
+
+        heap = self._heap
+        if not heap:
+            return -1
+        left = time.ticks_diff(heap[0][0], time.ticks_ms())
+        return left if left > 0 else 0
+
+    ################# Internal heap functions #################
+    def _schedule(self, timer):
+        deadline = time.ticks_add(timer._starttime, int(timer._count * 1000) + 1)
+        entry = timer._entry
+        if entry is not None:
+            # already in the heap - move it to its new place
+            entry[0] = deadline
+            self._siftUp(entry[2])
+            self._siftDown(entry[2])
+            return
+        entry = [deadline, timer, len(self._heap)]
+        timer._entry = entry
+        self._heap.append(entry)
+        self._siftUp(entry[2])
+
+    def _unschedule(self, timer):
+        entry = timer._entry
+        if entry is None:
+            return
+        timer._entry = None
+        heap = self._heap
+        last = heap.pop()
+        if last is entry:
+            return
+        # put the last entry in the hole and let it find its place
+        pos = entry[2]
+        heap[pos] = last
+        last[2] = pos
+        self._siftUp(pos)
+        self._siftDown(last[2])
+
+    def _siftUp(self, pos):
+        heap = self._heap
+        entry = heap[pos]
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            if time.ticks_diff(entry[0], heap[parent][0]) >= 0:
+                break
+            heap[pos] = heap[parent]
+            heap[pos][2] = pos
+            pos = parent
+        heap[pos] = entry
+        entry[2] = pos
+
+    def _siftDown(self, pos):
+        heap = self._heap
+        entry = heap[pos]
+        size = len(heap)
+        while True:
+            child = 2 * pos + 1
+            if child >= size:
+                break
+            if child + 1 < size and time.ticks_diff(heap[child + 1][0], heap[child][0]) < 0:
+                child += 1
+            if time.ticks_diff(heap[child][0], entry[0]) >= 0:
+                break
+            heap[pos] = heap[child]
+            heap[pos][2] = pos
+            pos = child
+        heap[pos] = entry
+        entry[2] = pos
 
 class Time:
     @classmethod
@@ -0,0 +1,265 @@
+"""
+# MQTT.py
+# A small MQTT 3.1.1 publisher (umqtt style) that can stand in for NET as
+# the DAL transport. Readings are published with QoS 1 to
+#   <prefix>/<warehouse_id>/<room_id>/<sensor_id>
+# on a persistent session, so instead of a full HTTP exchange each reading
+# costs one small packet out and a 4 byte PUBACK back.
+"""
+
+import socket
+import select
+import struct
+import time
+import ujson
+from Log import *
+from Payload import Payload
+
+class MQTT:
+    """
+    Has the same isconnected/postAsync/poll as NET and AsyncNET, so it can
+    be handed to the DAL as its net:
+
+        mqtt = MQTT(net, "192.168.1.10")
+        dal = DAL(net=mqtt, ...)
+
+    postAsync publishes straight away (the url is not used - the topic
+    comes from the reading) and the callback gets status 200 when the
+    broker's PUBACK arrives. Up to window messages can be waiting for
+    their PUBACK. poll() reads the PUBACKs and keeps the session alive, so
+    call it regularly like AsyncNET.poll.
+
+    If the connection drops, the unacknowledged messages are kept and sent
+    again (marked DUP) when we reconnect - the session is persistent
+    (clean session off), so the broker also remembers what it has already
+    seen. The DAL's flash queue covers a reboot in the middle.
+    """
+
+    CONNECT = 0x10
+    CONNACK = 0x20
+    PUBLISH = 0x30
+    PUBACK = 0x40
+    PINGREQ = 0xC0
+    PINGRESP = 0xD0
+    DISCONNECT = 0xE0
+
+    def __init__(self, net, server, port=1883, client_id=None, prefix="warehouse", keepalive=60,
+                 window=4, user=None, password=None, timeout=10, retry=5):
+        self.net = net
+        self.server = server
+        self.port = port
+        self.client_id = client_id if client_id else MQTT._defaultClientId()
+        self.prefix = prefix
+        self.keepalive = keepalive
+        self.window = window
+        self.user = user
+        self.password = password
+        self.timeout = timeout      # seconds to wait for CONNACK / a PUBACK before reconnecting
+        self.retry = retry          # seconds between reconnect attempts
+        self._sock = None
+        self._poller = None
+        self._pid = 0
+        self._inflight = {}         # packet id -> [topic, data, callback, sent at]
+        self._lastsend = 0
+        self._retryat = time.ticks_ms()
+
+    def isconnected(self):
+        """ True if the network link is up (the MQTT session connects when needed) """
+        return self.net.isconnected()
+
+    def canSend(self):
+        """ True while fewer than window messages are waiting for their PUBACK """
+        return len(self._inflight) < self.window
+
+    def topic(self, payload):
+        """ The topic a reading is published on """
+
+        if isinstance(payload, list) and payload and not isinstance(payload[0], int):
+            return f"{self.prefix}/bulk"
+        r = Payload.decode(payload)
+        return f"{self.prefix}/{r['warehouse_id']}/{r['room_id']}/{r['sensor_id']}"
+
+    def postAsync(self, url, payload, callback=None, reply=False):
+        """ Publish payload with QoS 1, callback(200, None) on PUBACK or (None, None) if it cannot be sent """
+
+        if len(self._inflight) >= self.window:
+            self.poll()
+        if len(self._inflight) >= self.window or not self._ensureConnected():
+            if len(self._inflight) >= self.window:
+                Log.e("MQTT: in-flight window full")
+            if callback:
+                callback(None, None)
+            return False
+
+        self._pid = self._pid % 65535 + 1
+        entry = [self.topic(payload), ujson.dumps(payload).encode(), callback, 0]
+        self._inflight[self._pid] = entry
+        try:
+            self._publish(self._pid, entry, False)
+        except OSError as e:
+            Log.e(f"MQTT: publish failed: {e}")
+            self._drop()
+        return None
+
+    def poll(self):
+        """ Read PUBACKs and keep the session alive - returns True while messages wait for their PUBACK """
+
+        if self._sock is None:
+            if self._inflight:
+                self._ensureConnected()
+            return len(self._inflight) > 0
+
+        try:
+            while self._poller.poll(0):
+                kind, body = self._readPacket()
+                if kind == MQTT.PUBACK:
+                    pid = struct.unpack('>H', body)[0]
+                    entry = self._inflight.pop(pid, None)
+                    if entry and entry[2]:
+                        try:
+                            entry[2](200, None)
+                        except Exception as e:
+                            Log.e(f"MQTT: callback failed: {e}")
+
+            now = time.ticks_ms()
+            for entry in self._inflight.values():
+                if time.ticks_diff(now, entry[3]) > self.timeout * 1000:
+                    raise OSError("no PUBACK from broker")
+            if time.ticks_diff(now, self._lastsend) > self.keepalive * 500:
+                self._send(bytes((MQTT.PINGREQ, 0)))
+        except OSError as e:
+            Log.e(f"MQTT: connection lost: {e}")
+            self._drop()
+        return len(self._inflight) > 0
+
+    def disconnect(self):
+        if self._sock is not None:
+            try:
+                self._send(bytes((MQTT.DISCONNECT, 0)))
+            except OSError:
+                pass
+        self._drop()
+
+    def connect(self)->bool:
+        """ Open the session (blocking, up to timeout) and resend anything not yet acknowledged """
+
+        self._drop()
+        try:
+            addr = socket.getaddrinfo(self.server, self.port, 0, socket.SOCK_STREAM)[0][-1]
+            self._sock = socket.socket()
+            self._sock.settimeout(self.timeout)
+            self._sock.connect(addr)
+
+            flags = 0x00    # clean session off - keep our session on the broker
+            payload = self._string(self.client_id)
+            if self.user is not None:
+                flags |= 0x80
+                payload += self._string(self.user)
+                if self.password is not None:
+                    flags |= 0x40
+                    payload += self._string(self.password)
+            body = self._string("MQTT") + bytes((4, flags)) + struct.pack('>H', self.keepalive) + payload
+            self._send(self._packet(MQTT.CONNECT, body))
+
+            kind, body = self._readPacket()
+            if kind != MQTT.CONNACK or body[1] != 0:
+                raise OSError(f"broker refused the connection ({body[1] if len(body) > 1 else '?'})")
+            Log.i(f"MQTT: connected to {self.server} as {self.client_id}{' (session resumed)' if body[0] & 1 else ''}")
+
+            self._poller = select.poll()
+            self._poller.register(self._sock, select.POLLIN)
+            for pid in self._inflight:
+                self._publish(pid, self._inflight[pid], True)
+            return True
+        except (OSError, IndexError) as e:
+            Log.e(f"MQTT: connect failed: {e}")
+            self._drop()
+            self._retryat = time.ticks_add(time.ticks_ms(), self.retry * 1000)
+            return False
+
+    def _ensureConnected(self):
+        if self._sock is not None:
+            return True
+        if not self.net.isconnected() or time.ticks_diff(time.ticks_ms(), self._retryat) < 0:
+            return False
+        return self.connect()
+
+    def _publish(self, pid, entry, dup):
+        entry[3] = time.ticks_ms()
+        self._send(self._packet(MQTT.PUBLISH | 0x02 | (0x08 if dup else 0), self._string(entry[0]) + struct.pack('>H', pid) + entry[1]))
+
+    def _drop(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._poller = None
+
+    def _send(self, data):
+        self._sock.sendall(data)
+        self._lastsend = time.ticks_ms()
+
+    def _recv(self, size):
+        data = b''
+        while len(data) < size:
+            more = self._sock.recv(size - len(data))
+            if not more:
+                raise OSError("connection closed by broker")
+            data += more
+        return data
+
+    def _readPacket(self):
+        """ Read one packet, returns (type, body) """
+
+        kind = self._recv(1)[0] & 0xF0
+        size, shift = 0, 0
+        while True:
+            b = self._recv(1)[0]
+            size |= (b & 0x7F) << shift
+            shift += 7
+            if not b & 0x80:
+                break
+        return kind, self._recv(size) if size else b''
+
+    def _packet(self, kind, body):
+        """ Fixed header (type and remaining length) + body """
+
+        head = bytearray((kind,))
+        size = len(body)
+        while True:
+            b = size & 0x7F
+            size >>= 7
+            head.append(b | 0x80 if size else b)
+            if not size:
+                break
+        return bytes(head) + body
+
+    def _string(self, s):
+        s = s.encode()
+        return struct.pack('>H', len(s)) + s
+
+    @staticmethod
+    def _defaultClientId():
+        """ A client id that stays the same across reboots, so the broker can keep our session """
+        try:
+            import machine
+            import ubinascii
+            return "pico-" + ubinascii.hexlify(machine.unique_id()).decode()
+        except (ImportError, AttributeError):
+            return "pico"
+
+if __name__ == "__main__":
+    import secrets
+    from NET import NET
+    net = NET(secrets.SSID, secrets.PASSWORD)
+    net.connect()
+    mqtt = MQTT(net, "192.168.1.10")
+    reading = {"timestamp": "2025-01-01 12:00:00", "room_id": 101, "sensor_id": 202, "warehouse_id": 1, "temperature": 21.5}
+    start = time.ticks_us()
+    mqtt.postAsync(None, reading, lambda status, body: print("PUBACK", status))
+    print(f"publish took {time.ticks_diff(time.ticks_us(), start)} us")
+    while mqtt.poll():
+        time.sleep(0.05)
+    mqtt.disconnect()
@@ -0,0 +1,89 @@
+"""
+# TimeService.py
+# Keeps the Pico clock set from NTP, re-syncing every few hours, measures
+# how far the RTC drifts between syncs and makes the reading timestamps
+# for the DAL without re-formatting the date for every reading.
+"""
+
+import time
+from machine import RTC
+from Log import *
+
+class TimeService:
+    """
+    sync() sets the RTC from NTP (UTC) and, from the second sync on,
+    works out the RTC drift in ppm from how far off it was. maintain() is
+    meant to be called from a timer while WiFi is up and only syncs once
+    resync seconds have passed (or sooner while we have never synced).
+
+    timestamp() returns "YYYY-MM-DD HH:MM:SS" with the measured drift
+    corrected for. The "YYYY-MM-DD " part is cached and only rebuilt when
+    the day changes, so a reading just formats the time of day.
+    """
+
+    def __init__(self, resync=6 * 3600, retry=60):
+        self.resync = resync        # seconds between syncs
+        self.retry = retry          # seconds before trying again after a failed sync
+        self.drift = 0.0            # RTC drift in ppm, positive if it runs slow
+        self.synced = False
+        self._lastsync = None       # RTC seconds at the last good sync
+        self._nextsync = time.ticks_ms()
+        self._day = None
+        self._prefix = ''
+
+    def maintain(self):
+        """ Sync if it is time to - returns True if a sync was done """
+
+        if time.ticks_diff(time.ticks_ms(), self._nextsync) < 0:
+            return False
+        return self.sync()
+
+    def sync(self)->bool:
+        """ Set the RTC from NTP now. Blocks for up to the NTP timeout (about 1 sec) """
+
+        try:
+            import ntptime
+            ntp = ntptime.time()
+        except Exception as e:
+            Log.e(f"TimeService: NTP sync failed: {e}")
+            self._nextsync = time.ticks_add(time.ticks_ms(), self.retry * 1000)
+            return False
+
+        local = int(time.time())
+        if self._lastsync is not None and local > self._lastsync:
+            # how much the RTC lost (or gained) since the last sync
+            self.drift = (ntp - local) / (local - self._lastsync) * 1000000
+            Log.i(f"TimeService: clock was {ntp - local} s off, drift {self.drift:.1f} ppm")
+
+        tm = time.gmtime(ntp)
+        RTC().datetime((tm[0], tm[1], tm[2], tm[6] + 1, tm[3], tm[4], tm[5], 0))
+        self._lastsync = ntp
+        self._day = None
+        self.synced = True
+        self._nextsync = time.ticks_add(time.ticks_ms(), self.resync * 1000)
+        Log.i(f"TimeService: NTP time synced: {self.timestamp()}")
+        return True
+
+    def now(self):
+        """ Seconds since the epoch (UTC), corrected for the measured drift """
+
+        t = int(time.time())
+        if self._lastsync is not None and self.drift:
+            t += int((t - self._lastsync) * self.drift / 1000000)
+        return t
+
+    def timestamp(self):
+        """ The time now as "YYYY-MM-DD HH:MM:SS" """
+
+        day, secs = divmod(self.now(), 86400)
+        if day != self._day:
+            tm = time.gmtime(day * 86400)
+            self._prefix = "%04d-%02d-%02d " % (tm[0], tm[1], tm[2])
+            self._day = day
+        return "%s%02d:%02d:%02d" % (self._prefix, secs // 3600, secs // 60 % 60, secs % 60)
+
+if __name__ == "__main__":
+    clock = TimeService()
+    print(clock.timestamp())
+    clock.sync()
+    print(clock.timestamp())
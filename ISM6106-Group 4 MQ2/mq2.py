@@ -4,6 +4,7 @@
 
 from machine import Pin, ADC
 from micropython import const
+from array import array
 import utime
 from math import exp, log
 
@@ -29,16 +30,23 @@ class BaseMQ(object):
     #    I.e. for multi-data sensors, like MQ2 it would take a while to receive full data
     STRATEGY_ACCURATE = const(2)    
 
+    ## This strategy never blocks. Readings are taken one at a time by calling sample()
+    #  from the main loop, and every reading uses the Rs averaged over the last
+    #  complete window of MQ_SAMPLE_TIMES samples. Until the first window is complete
+    #  a single immediate reading is used.
+    STRATEGY_BACKGROUND = const(3)
+
     ## Initialization. 
     #  @param pinData Data pin. Should be ADC pin
     #  @param pinHeater Pass -1 if heater connected to main power supply. Otherwise pass another pin capable of PWM
     #  @param boardResistance On troyka modules there is 10K resistor, on other boards could be other values
     #  @param baseVoltage Optionally board could run on 3.3 Volds, base voltage is 5.0 Volts. Passing incorrect values
     #  would cause incorrect measurements
-    #  @param measuringStrategy Currently two main strategies are implemented:
+    #  @param measuringStrategy Currently three strategies are implemented:
     #  - STRATEGY_FAST = 1 In this case data would be taken immideatly. Could be unreliable
     #  - STRATEGY_ACCURATE = 2 In this case data would be taken MQ_SAMPLE_TIMES times with MQ_SAMPLE_INTERVAL delay
     #  For sensor with different gases it would take a while
+    #  - STRATEGY_BACKGROUND = 3 Data comes from the averaged Rs collected by sample(), nothing blocks
     def __init__(self, pinData, pinHeater=-1, boardResistance = 10, baseVoltage = 3.3, measuringStrategy = STRATEGY_ACCURATE):
 
         ## Heater is enabled
@@ -58,6 +66,10 @@ class BaseMQ(object):
         self.pinData = ADC(pinData)
         self.measuringStrategy = measuringStrategy
         self._boardResistance = boardResistance
+        ## Ring buffer for the background sampler
+        self._samples = array('f', [0] * self.MQ_SAMPLE_TIMES)
+        self._sampleIndex = 0
+        self._lastSample = utime.ticks_ms()
         if pinHeater != -1:
             self.useSeparateHeater = True
             self.pinHeater = Pin(pinHeater, Pin.OUTPUT)
@@ -77,7 +89,9 @@ class BaseMQ(object):
         if ro == -1:
             ro = 0
             print("Calibrating:")
-            for i in range(0,MQ_SAMPLE_TIMES + 1):        
+            # same MQ_SAMPLE_TIMES readings as every other average, so Ro and
+            # Rs are on the same scale whatever the strategy
+            for i in range(0,MQ_SAMPLE_TIMES):        
                 print("Step {0}".format(i))
                 ro += self.__calculateResistance__(self.pinData.read_u16())
                 utime.sleep_ms(MQ_SAMPLE_INTERVAL)
@@ -128,9 +142,13 @@ class BaseMQ(object):
     # If data is taken frequently, data reading could be unreliable. Check @see dataIsReliable flag
     # Also refer to measuring strategy
     def __readRs__(self):
+        if self.measuringStrategy == self.STRATEGY_BACKGROUND:
+            if self._rsCache is not None:
+                return self._rsCache
+            return self.__calculateResistance__(self.pinData.read_u16())
         if self.measuringStrategy == STRATEGY_ACCURATE :            
                 rs = 0
-                for i in range(0, MQ_SAMPLE_TIMES + 1): 
+                for i in range(0, MQ_SAMPLE_TIMES): 
                     rs += self.__calculateResistance__(self.pinData.read_u16())
                     utime.sleep_ms(MQ_SAMPLE_INTERVAL)
 
@@ -146,6 +164,34 @@ class BaseMQ(object):
         return rs
 
 
+    ## Last averaged Rs published by sample() (or by an accurate reading),
+    #  None until the first one is available
+    def cachedRs(self):
+        return self._rsCache
+
+    ## Background sampling step for STRATEGY_BACKGROUND
+    #  Call this often (every tick of the main loop or from a timer). It takes at most one
+    #  ADC reading, and only once MQ_SAMPLE_INTERVAL has passed since the previous one.
+    #  When the window of MQ_SAMPLE_TIMES readings is full, the averaged Rs is published to
+    #  the cache used by every read method. Returns True when a new Rs was published.
+    def sample(self):
+        now = utime.ticks_ms()
+        if utime.ticks_diff(now, self._lastSample) < self.MQ_SAMPLE_INTERVAL:
+            return False
+        self._lastSample = now
+        self._samples[self._sampleIndex] = self.__calculateResistance__(self.pinData.read_u16())
+        self._sampleIndex += 1
+        if self._sampleIndex < self.MQ_SAMPLE_TIMES:
+            return False
+        self._sampleIndex = 0
+        rs = 0
+        for v in self._samples:
+            rs += v
+        self._rsCache = rs / self.MQ_SAMPLE_TIMES
+        self.dataIsReliable = True
+        self._lastMesurement = now
+        return True
+
     def readScaled(self, a, b):        
         return exp((log(self.readRatio())-b)/a)
 
@@ -202,26 +248,108 @@ class MQ2(BaseMQ):
 	## Clean air coefficient
 	MQ2_RO_BASE = float(9.83)
 
-	def __init__(self, pinData, pinHeater=-1, boardResistance = 10, baseVoltage = 3.3, measuringStrategy = BaseMQ.STRATEGY_ACCURATE):
+	## Positions of the gases in the readAll result
+	LPG = const(0)
+	METHANE = const(1)
+	SMOKE = const(2)
+	HYDROGEN = const(3)
+
+	## Gas curves (a, b) in the same order as the readAll result
+	CURVES = ((-0.45, 2.95), (-0.38, 3.21), (-0.42, 3.54), (-0.48, 3.32))
+
+	## Number of points in each lookup table (256 segments over the ADC range)
+	LUT_SIZE = const(257)
+
+	## Initialization - same as BaseMQ, plus
+	#  @param lookup Pass True to have calibrate() precompute ppm-vs-ADC lookup tables for
+	#  the four gas curves. readAll then indexes and interpolates the tables instead of
+	#  calling log and exp for every gas.
+	def __init__(self, pinData, pinHeater=-1, boardResistance = 10, baseVoltage = 3.3, measuringStrategy = BaseMQ.STRATEGY_ACCURATE, lookup = False):
 		# Call superclass to fill attributes
 		super().__init__(pinData, pinHeater, boardResistance, baseVoltage, measuringStrategy)
+		## Result buffer reused by every readAll call
+		self._all = array('f', [0] * 4)
+		self._useLookup = lookup
+		## The four tables, one after the other in a single array('f'), built by calibrate
+		self._lut = None
 		pass
 
+	## Calibrate as usual, then rebuild the lookup tables for the new Ro if lookup mode is on
+	def calibrate(self, ro=-1):
+		super().calibrate(ro)
+		if self._useLookup:
+			self.buildLookupTables()
+
+	## Precompute the ppm of each gas at LUT_SIZE evenly spaced ADC values for the
+	#  current Ro. Entry 0 (no voltage, infinite Rs) is 0 ppm. The last entry uses the
+	#  reading half a step below full scale, since full scale means Rs = 0.
+	def buildLookupTables(self):
+		size = self.LUT_SIZE
+		step = 65535 / (size - 1)
+		lut = array('f', [0] * (4 * size))
+		for i in range(1, size):
+			raw = i * step if i < size - 1 else 65535 - step / 2
+			logratio = log(self.__calculateResistance__(raw) / self._ro)
+			g = 0
+			for (a, b) in self.CURVES:
+				lut[g * size + i] = exp((logratio - b) / a)
+				g += 1
+		self._lut = lut
+
 	## Measure liquefied hydrocarbon gas, LPG
 	def readLPG(self):
-		return self.readScaled(-0.45, 2.95)
+		return self.readScaled(*self.CURVES[self.LPG])
 		
 	## Measure methane	
 	def readMethane(self):
-		return self.readScaled(-0.38, 3.21)
+		return self.readScaled(*self.CURVES[self.METHANE])
 
 	## Measure smoke
 	def readSmoke(self):
-		return self.readScaled(-0.42, 3.54)
+		return self.readScaled(*self.CURVES[self.SMOKE])
 
 	## Measure hydrogen
 	def readHydrogen(self):
-		return self.readScaled(-0.48, 3.32)
+		return self.readScaled(*self.CURVES[self.HYDROGEN])
+
+	## Measure all four gases from a single Rs reading and a single log(ratio).
+	#  Returns an array('f') indexed by MQ2.LPG, MQ2.METHANE, MQ2.SMOKE and MQ2.HYDROGEN.
+	#  The same array is reused and overwritten by the next call, so copy the values
+	#  out if you need to keep them.
+	def readAll(self):
+		return self.concentrationsFromRs(self.__readRs__())
+
+	## Compute all four gases for a given Rs - from the lookup tables if they were built,
+	#  otherwise with the exact formula. Result goes into the same array readAll returns.
+	def concentrationsFromRs(self, rs):
+		if self._lut is not None:
+			return self.__lookupFromRs__(rs)
+		return self.__exactFromRs__(rs)
+
+	def __exactFromRs__(self, rs):
+		logratio = log(rs / self._ro)
+		result = self._all
+		i = 0
+		for (a, b) in self.CURVES:
+			result[i] = exp((logratio - b) / a)
+			i += 1
+		return result
+
+	def __lookupFromRs__(self, rs):
+		# The ADC reading that gives this Rs (inverse of __calculateResistance__), so an
+		# averaged Rs maps back onto the table too
+		size = self.LUT_SIZE
+		pos = self._boardResistance / (rs + self._boardResistance) * (size - 1)
+		i = int(pos)
+		if i >= size - 1:
+			i = size - 2
+		frac = pos - i
+		lut = self._lut
+		result = self._all
+		for g in range(4):
+			lo = lut[g * size + i]
+			result[g] = lo + (lut[g * size + i + 1] - lo) * frac
+		return result
 
     ##  Base RO differs for every sensor family
 	def getRoInCleanAir(self):
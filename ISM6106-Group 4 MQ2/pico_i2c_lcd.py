@@ -15,6 +15,10 @@ MASK_E  = 0x04       # P2
 SHIFT_BACKLIGHT = 3  # P3
 SHIFT_DATA      = 4  # P4-P7
 
+# Most LCD bytes sent in one I2C transfer - a command and a 40 column line.
+# Each LCD byte takes 4 I2C bytes (two nibbles, each with E high then low)
+BURST = 41
+
 class I2cLcd(LcdApi):
     
     #Implements a HD44780 character LCD connected via PCF8574 on I2C
@@ -22,6 +26,10 @@ class I2cLcd(LcdApi):
     def __init__(self, i2c, i2c_addr, num_lines, num_columns):
         self.i2c = i2c
         self.i2c_addr = i2c_addr
+        # preallocated so writing to the display does not allocate
+        self._one = bytearray(4)
+        self._burst = bytearray(4 * BURST)
+        self._view = memoryview(self._burst)
         self.i2c.writeto(self.i2c_addr, bytes([0]))
         utime.sleep_ms(20)   # Allow LCD time to powerup
         # Send reset 3 times
@@ -61,29 +69,50 @@ class I2cLcd(LcdApi):
         
     def hal_write_command(self, cmd):
         # Write a command to the LCD. Data is latched on the falling edge of E.
-        byte = ((self.backlight << SHIFT_BACKLIGHT) |
-                (((cmd >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
-        byte = ((self.backlight << SHIFT_BACKLIGHT) |
-                ((cmd & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
+        self._encode(self._one, 0, cmd, 0)
+        self.i2c.writeto(self.i2c_addr, self._one)
         if cmd <= 3:
             # The home and clear commands require a worst case delay of 4.1 msec
             utime.sleep_ms(5)
-        gc.collect()
 
     def hal_write_data(self, data):
         # Write data to the LCD. Data is latched on the falling edge of E.
-        byte = (MASK_RS |
+        self._encode(self._one, 0, data, MASK_RS)
+        self.i2c.writeto(self.i2c_addr, self._one)
+
+    def hal_write_data_burst(self, data, cmd=None):
+        # Write a command (normally a cursor move) and a run of data bytes
+        # in a single I2C transfer - or one per BURST bytes for long runs.
+        # At 400 kHz every LCD byte takes ~90 usec on the bus, longer than
+        # the 37 usec the LCD needs, so no delays are needed in between.
+        buf = self._burst
+        pos = 0
+        if cmd is not None:
+            if cmd <= 3:
+                self.hal_write_command(cmd)
+            else:
+                self._encode(buf, 0, cmd, 0)
+                pos = 4
+        text = isinstance(data, str)
+        for byte in data:
+            if pos == len(buf):
+                self.i2c.writeto(self.i2c_addr, buf)
+                pos = 0
+            self._encode(buf, pos, ord(byte) if text else byte, MASK_RS)
+            pos += 4
+        if pos:
+            self.i2c.writeto(self.i2c_addr, self._view[:pos])
+
+    def _encode(self, buf, pos, value, rs):
+        # The 4 PCF8574 bytes for one LCD byte: high nibble with E high then
+        # low, then the low nibble the same way
+        byte = (rs |
                 (self.backlight << SHIFT_BACKLIGHT) |
-                (((data >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
-        byte = (MASK_RS |
+                (((value >> 4) & 0x0f) << SHIFT_DATA))
+        buf[pos] = byte | MASK_E
+        buf[pos + 1] = byte
+        byte = (rs |
                 (self.backlight << SHIFT_BACKLIGHT) |
-                ((data & 0x0f) << SHIFT_DATA))      
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
-        gc.collect()
\ No newline at end of file
+                ((value & 0x0f) << SHIFT_DATA))
+        buf[pos + 2] = byte | MASK_E
+        buf[pos + 3] = byte
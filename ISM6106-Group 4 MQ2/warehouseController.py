@@ -1,6 +1,7 @@
 import utime
 from Log import *
 from Sensors_advanced import GasSensor
+from mq2 import MQ2
 from Counters import SoftwareTimer
 from Button import Button
 from LightStrip import LightStrip
@@ -8,7 +9,8 @@ from Buzzer import PassiveBuzzer
 from Displays import LCDDisplay
 from warehouseStateModel import *
 from DAL import DAL
-from NET import NET
+from AsyncNET import AsyncNET
+from TimeService import TimeService
 import secrets
 
 RED    = (255, 0, 0)
@@ -27,21 +29,29 @@ class WarehouseAlarmController:
 
         Log.i("Initializing GAS-Only Alarm System...")
 
-        self.gas = GasSensor(pin=26, name="mq2") 
+        # NTP time for the reading timestamps, re-synced every 6 hours
+        self.clock = TimeService()
+
+        # background sampling - readings never block the state model loop
+        # lookup - gas curves come from tables built at calibration
+        # clock - dates the saved calibration once NTP has set it
+        self.gas = GasSensor(pin=26, name="mq2", background=True, lookup=True, clock=self.clock)
         self.buzzer = PassiveBuzzer(pin=15, name="buzzer")
         self.light  = LightStrip(pin=7, name="lightstrip", numleds=8, brightness=0.5)
         self.display = LCDDisplay(sda=0, scl=1)
         self.resetButton = Button(pin=17, name="reset", handler=None)
-        self.net = NET(secrets.SSID, secrets.PASSWORD)
+        self.net = AsyncNET(secrets.SSID, secrets.PASSWORD)
 
         self.dal = DAL(
             net=self.net,
+            clock=self.clock,
             url="https://oracleapex.com/ords/priscilallopes/api/sensor-readings",
             warehouse_id=1,
             room_id=ROOM_ID
         )
 
-        self.net.connect()
+        # Connect WiFi in the background - the wifi timer keeps it going
+        self.net.start(self._wifiChanged)
 
         # -------- STATE MACHINE --------
         machine = WarehouseStateMachine(self, debug=True)
@@ -55,9 +65,21 @@ class WarehouseAlarmController:
         self.model.addTransition(STATE_ALARM,   ["reset_event"], STATE_NORMAL)
 
         # Timer
-        self.sensorTimer = SoftwareTimer("sensorpoll", None)
+        self.sensorTimer = SoftwareTimer("sensorpoll", None, periodic=True)
         self.model.addTimer(self.sensorTimer)
 
+        # Sends readings that were queued while offline, a couple at a time
+        self.uploadTimer = SoftwareTimer("upload", None, periodic=True)
+        self.model.addTimer(self.uploadTimer)
+
+        # Checks the WiFi link and reconnects (with backoff) when it drops
+        self.wifiTimer = SoftwareTimer("wifi", None, periodic=True)
+        self.model.addTimer(self.wifiTimer)
+
+        # Feeds the MQ2 background sampler one ADC reading at a time
+        self.sampleTimer = SoftwareTimer("gassample", None, periodic=True)
+        self.model.addTimer(self.sampleTimer)
+
         # GAS threshold logic
         self.gas_bad_count = 0
         self.WARNING_GAS = 0.3 
@@ -77,21 +99,18 @@ class WarehouseAlarmController:
 
         if state == STATE_NORMAL:
             self._alarmoff()
-            self.display.clear()
-            self.display.showText("NORMAL SYSTEM", 0, 0)
+            self.display.showLines("NORMAL SYSTEM")
             self.light.setColor(GREEN)
 
         elif state == STATE_WARNING:
-            self.display.clear()
-            self.display.showText("WARNING", 0, 0)
-            self.display.showText("CHECK GAS SENSOR", 1, 0)
+            self.display.showLines("WARNING", "CHECK GAS SENSOR")
             self.light.setColor(YELLOW)
 
         elif state == STATE_ALARM:
             Log.e("!!! GAS ALARM !!!")
-            self.display.clear()
-            self.display.showText("*** GAS ALARM ***", 0, 0)
-            self.display.showText("PRESS RESET!", 1, 0)
+            # the alarm text is wider than the display - scroll it in the top row
+            self.display.showLines("", "PRESS RESET!")
+            self.display.startScroll("*** GAS ALARM ***", 0)
 
             self._alarmon = True
             self.light.setColor(RED)
@@ -126,10 +145,25 @@ class WarehouseAlarmController:
             self.model.processEvent("reset_event")
             return True
 
+        # One MQ2 sample
+        if event == "gassample_timeout":
+            self.gas.sample()
+            return True
+
         # Sensor poll
         if event == "sensorpoll_timeout":
             self._read_gas()
-            self.sensorTimer.start(10)
+            return True
+
+        # Offline queue
+        if event == "upload_timeout":
+            self.dal.flush()
+            return True
+
+        # WiFi connection manager
+        if event == "wifi_timeout":
+            if self.net.maintain():
+                self.clock.maintain()
             return True
 
         return False
@@ -139,8 +173,19 @@ class WarehouseAlarmController:
     # STATE DO — ALARM PATTERN
     # ======================================================
     def stateDo(self, state):
+        # let background POSTs make progress, and come back soon while any are left
+        if self.net.poll():
+            self.model.wakeAfter(0.05)
+
+        # next frame of any scrolling text on the display
+        wait = self.display.tick()
+        if wait is not None:
+            self.model.wakeAfter(wait)
+
         if state == STATE_ALARM:
             self._alarm_pattern()
+            # keep the tickless loop coming around while the alarm pattern runs
+            self.model.wakeAfter(0)
 
 
     # ======================================================
@@ -169,12 +214,13 @@ class WarehouseAlarmController:
     def _read_gas(self):
 
         ratio = self.gas.rawValue()
-        readings = self.gas.getGasConcentrations()
+        # one sensor reading for all four gases
+        readings = self.gas.readAll()
 
-        gas = readings["Smoke"]
-        hydrogen = readings["Hydrogen"]
-        lpg = readings["LPG"]
-        methane = readings["Methane"]
+        gas = readings[MQ2.SMOKE]
+        hydrogen = readings[MQ2.HYDROGEN]
+        lpg = readings[MQ2.LPG]
+        methane = readings[MQ2.METHANE]
 
         Log.i(f"Gas ratio={ratio}")
         Log.i(f"LPG={lpg}, gas={gas}, Hydrogen={hydrogen}, Methane={methane}")
@@ -209,6 +255,14 @@ class WarehouseAlarmController:
     # ======================================================
     # HELPERS
     # ======================================================
+    def _wifiChanged(self, connected):
+        if connected:
+            self.clock.sync()
+            # send what piled up while we were offline
+            self.dal.flush()
+        else:
+            Log.e("WiFi down - readings are queued until it is back")
+
     def _alarmoff(self):
         try:
             self.buzzer.stop()
@@ -222,7 +276,11 @@ class WarehouseAlarmController:
     def run(self):
         Log.i("Starting gas polling timer (10 sec)...")
         self.sensorTimer.start(10)
-        self.model.run()
+        self.uploadTimer.start(5)
+        self.wifiTimer.start(2)
+        self.sampleTimer.start(0.5)
+        # Sleep between deadlines instead of waking up 10 times a second
+        self.model.run(tickless=True)
 
     def stop(self):
         self.model.stop()
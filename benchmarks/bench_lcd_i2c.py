@@ -0,0 +1,124 @@
+"""
+# bench_lcd_i2c.py
+# I2C traffic of the pico_i2c_lcd driver, counted on a fake I2C bus
+# Runs on a PC (python3 benchmarks/bench_lcd_i2c.py) or on the Pico next to
+# pico_i2c_lcd.py and lcd_api.py - no display is needed either way. For a
+# few typical screen updates it prints the number of I2C transactions, the
+# bytes sent, the time they take on a 400 kHz bus and the time spent in the
+# driver, for the burst writes and for the original byte-at-a-time driver.
+"""
+
+import gc
+import os
+import sys
+import time
+
+try:
+    import machine
+except ImportError:
+    # on a PC - give the driver the few bits of machine/utime it imports
+    import types
+    sys.modules['machine'] = types.ModuleType('machine')
+    sys.modules['machine'].I2C = object
+    utime = types.ModuleType('utime')
+    utime.sleep_ms = lambda ms: None
+    sys.modules['utime'] = utime
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ISM6106-Group 4 MQ2"))
+
+from lcd_api import LcdApi
+from pico_i2c_lcd import I2cLcd, MASK_RS, MASK_E, SHIFT_BACKLIGHT, SHIFT_DATA
+
+ITERATIONS = 200
+BUS_HZ = 400000
+
+if hasattr(time, 'ticks_us'):
+    _now_us = time.ticks_us
+    _elapsed_us = lambda start: time.ticks_diff(time.ticks_us(), start)
+else:
+    _now_us = lambda: time.perf_counter_ns() // 1000
+    _elapsed_us = lambda start: time.perf_counter_ns() // 1000 - start
+
+class FakeI2C:
+    """ Counts what would go over the bus instead of sending it """
+
+    def __init__(self):
+        self.transactions = 0
+        self.bytes = 0
+
+    def scan(self):
+        return [0x27]
+
+    def writeto(self, addr, buf):
+        self.transactions += 1
+        self.bytes += len(buf)
+
+    def busTime(self):
+        """ Microseconds on the bus: start, address and data bytes of 9 clocks each, stop """
+        return (self.transactions * (9 + 2) + self.bytes * 9) * 1000000 // BUS_HZ
+
+class LegacyI2cLcd(I2cLcd):
+    """ The driver as it was - four transfers and a gc.collect per LCD byte, text a char at a time """
+
+    def hal_write_command(self, cmd):
+        for byte in self._legacyBytes(cmd, 0):
+            self.i2c.writeto(self.i2c_addr, bytes([byte]))
+        gc.collect()
+
+    def hal_write_data(self, data):
+        for byte in self._legacyBytes(data, MASK_RS):
+            self.i2c.writeto(self.i2c_addr, bytes([byte]))
+        gc.collect()
+
+    def hal_write_data_burst(self, data, cmd=None):
+        LcdApi.hal_write_data_burst(self, data, cmd)
+
+    def putstr(self, string):
+        for char in string:
+            self.putchar(char)
+
+    def write_at(self, cursor_x, cursor_y, data):
+        self.move_to(cursor_x, cursor_y)
+        self.putstr(data)
+
+    def _legacyBytes(self, value, rs):
+        hi = rs | (self.backlight << SHIFT_BACKLIGHT) | (((value >> 4) & 0x0f) << SHIFT_DATA)
+        lo = rs | (self.backlight << SHIFT_BACKLIGHT) | ((value & 0x0f) << SHIFT_DATA)
+        return (hi | MASK_E, hi, lo | MASK_E, lo)
+
+def oneLine(lcd):
+    lcd.move_to(0, 0)
+    lcd.putstr("NORMAL SYSTEM   ")
+
+def fullScreen(lcd):
+    lcd.move_to(0, 0)
+    lcd.putstr("*** GAS ALARM **")
+    lcd.move_to(0, 1)
+    lcd.putstr("PRESS RESET!    ")
+
+def reading(lcd):
+    # what LCDDisplay sends when only the digits of a reading change
+    lcd.write_at(2, 1, "21.7")
+
+SCENARIOS = (
+    ("one 16 char line", oneLine),
+    ("full 2x16 screen", fullScreen),
+    ("4 changed cells", reading),
+)
+
+def bench(cls, scenario):
+    bus = FakeI2C()
+    lcd = cls(bus, 0x27, 2, 16)
+    bus.transactions = bus.bytes = 0
+    scenario(lcd)
+    counted = (bus.transactions, bus.bytes, bus.busTime())
+    start = _now_us()
+    for i in range(ITERATIONS):
+        scenario(lcd)
+    return counted + (_elapsed_us(start) / ITERATIONS,)
+
+if __name__ == "__main__":
+    print(f"{'':18s} {'driver':8s} {'transfers':>9s} {'bytes':>6s} {'bus us':>7s} {'cpu us':>8s}")
+    for name, scenario in SCENARIOS:
+        for label, cls in (("legacy", LegacyI2cLcd), ("burst", I2cLcd)):
+            transfers, size, bus, cpu = bench(cls, scenario)
+            print(f"{name:18s} {label:8s} {transfers:9d} {size:6d} {bus:7d} {cpu:8.1f}")
@@ -0,0 +1,56 @@
+"""
+# bench_mq2_lut.py
+# Accuracy report and benchmark for the MQ2 lookup table mode
+# Copy this file to the Pico next to mq2.py (one of the MQ2 project folders)
+# and run it from Thonny. No gas is needed - the sensor is calibrated with a
+# fixed Ro and the readings are computed for a sweep of Rs values, so both the
+# exact formula and the lookup tables see exactly the same input.
+"""
+
+import time
+from mq2 import MQ2
+
+RO = 10.0
+ITERATIONS = 1000
+GASES = ('LPG', 'Methane', 'Smoke', 'Hydrogen')
+
+def sweep(lo, hi, steps):
+    """ Rs/Ro ratios spaced evenly on a log scale between lo and hi """
+    factor = (hi / lo) ** (1 / (steps - 1))
+    return [lo * factor ** i for i in range(steps)]
+
+def accuracy(mq, ratios):
+    worst = [0.0] * 4
+    total = [0.0] * 4
+    for ratio in ratios:
+        rs = ratio * RO
+        exact = list(mq.__exactFromRs__(rs))
+        approx = mq.__lookupFromRs__(rs)
+        for g in range(4):
+            err = abs(approx[g] - exact[g]) / exact[g]
+            total[g] += err
+            if err > worst[g]:
+                worst[g] = err
+    for g in range(4):
+        print(f"  {GASES[g]:9s} max error {worst[g]*100:7.3f} %   mean error {total[g]/len(ratios)*100:7.3f} %")
+
+def bench(fn, rs):
+    start = time.ticks_us()
+    for i in range(ITERATIONS):
+        fn(rs)
+    return time.ticks_diff(time.ticks_us(), start) / ITERATIONS
+
+if __name__ == "__main__":
+    mq = MQ2(26, measuringStrategy=MQ2.STRATEGY_BACKGROUND, lookup=True)
+    mq.calibrate(RO)
+
+    print(f"Lookup tables: {MQ2.LUT_SIZE} points x 4 gases, {len(mq._lut) * 4} bytes")
+    print("Accuracy for Rs/Ro between 0.3 and 3 (typical alarm range):")
+    accuracy(mq, sweep(0.3, 3, 200))
+    print("Accuracy for Rs/Ro between 0.1 and 10 (full datasheet range):")
+    accuracy(mq, sweep(0.1, 10, 200))
+
+    rs = 1.5 * RO
+    exact = bench(mq.__exactFromRs__, rs)
+    lookup = bench(mq.__lookupFromRs__, rs)
+    print(f"All four gases: exact {exact:8.2f} us   lookup {lookup:8.2f} us")
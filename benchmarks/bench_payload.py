@@ -0,0 +1,46 @@
+"""
+# bench_payload.py
+# Size and encoding-time comparison of the DAL wire formats
+# Copy this file to the Pico next to Payload.py (any of the project folders)
+# and run it from Thonny. For each reading type it prints the JSON size of
+# every format and the time for Payload.encode + ujson.dumps, which is the
+# work done per post.
+"""
+
+import time
+import ujson
+from Payload import Payload
+
+ITERATIONS = 500
+TS = "2025-01-01 12:00:00"
+
+def reading(**values):
+    """ A buildPayload-style dictionary with every field null except values """
+    payload = {"timestamp": TS, "reading_ts": TS, "room_id": 101, "sensor_id": 201,
+               "warehouse_id": 1}
+    for name in Payload.FIELDS[4:]:
+        payload[name] = None
+    payload.update(values)
+    return payload
+
+READINGS = (
+    ("temperature", reading(temperature=21.53)),
+    ("humidity", reading(humidity=48.2)),
+    ("gas", reading(gas=0.3142, hydrogen_ppm=12.87, lpg_ppm=9.413, methane_ppm=25.06)),
+)
+
+def bench(payload, format):
+    start = time.ticks_us()
+    for i in range(ITERATIONS):
+        ujson.dumps(Payload.encode(payload, format))
+    return time.ticks_diff(time.ticks_us(), start) / ITERATIONS
+
+if __name__ == "__main__":
+    for name, payload in READINGS:
+        print(f"{name} reading:")
+        full = len(ujson.dumps(payload))
+        for format in Payload.FORMATS:
+            wire = ujson.dumps(Payload.encode(payload, format))
+            if Payload.decode(ujson.loads(wire)) != Payload.decode(payload):
+                print(f"  {format}: DECODE MISMATCH")
+            print(f"  {format:8s} {len(wire):4d} bytes ({len(wire) * 100 // full:3d} %)   {bench(payload, format):8.1f} us")
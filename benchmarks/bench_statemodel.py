@@ -0,0 +1,128 @@
+"""
+# bench_statemodel.py
+# Micro-benchmark for StateModel event dispatch
+# Copy this file to the Pico next to StateModel.py (any of the project folders)
+# and run it from Thonny. Measures the cost of processEvent (by name) and
+# processEventId (by integer id) for models with 3, 30 and 300 registered events,
+# next to the original dispatch (event list search plus a scan of the state's
+# transitions) as a reference.
+"""
+
+import time
+from StateModel import StateModel
+
+ITERATIONS = 2000
+
+def _now_us():
+    return time.ticks_us()
+
+def _elapsed_us(start):
+    return time.ticks_diff(time.ticks_us(), start)
+
+class QuietHandler:
+    """ A handler that does nothing so we only measure the model itself """
+
+    def stateEntered(self, state, event):
+        pass
+
+    def stateLeft(self, state, event):
+        pass
+
+    def stateEvent(self, state, event):
+        return True
+
+    def stateDo(self, state):
+        pass
+
+class BaselineModel:
+    """
+    Just the event dispatch of the original StateModel: processEvent checks
+    the name against the list of events, then scans the transitions of the
+    current state for it.
+    """
+
+    def __init__(self, numstates, handler):
+        self._transitions = [None] * numstates
+        self._curState = -1
+        self._handler = handler
+        self._events = ['no_event']
+
+    def addCustomEvent(self, event):
+        self._events.append(event)
+        return event
+
+    def addTransition(self, fromState, events, toState):
+        for event in events:
+            if not self._transitions[fromState]:
+                self._transitions[fromState] = []
+            self._transitions[fromState].append((event, toState))
+
+    def getTransition(self, fromState, event):
+        if self._transitions[fromState]:
+            for (e, s) in self._transitions[fromState]:
+                if e == event:
+                    return s
+        return -1
+
+    def gotoState(self, newState, event="no_event"):
+        self._handler.stateLeft(self._curState, event)
+        self._curState = newState
+        self._handler.stateEntered(self._curState, event)
+
+    def processEvent(self, event):
+        if event in self._events:
+            newstate = self.getTransition(self._curState, event)
+            if newstate >= 0:
+                self.gotoState(newstate, event)
+        else:
+            raise ValueError(f"Invalid event {event}")
+
+def buildModel(numevents, cls=StateModel):
+    """
+    Build a 2 state model with numevents custom events. Every event has a
+    transition out of state 0, and only the last one goes to state 1, so
+    dispatching the last event is the worst case for a linear scan.
+    """
+
+    model = cls(2, QuietHandler())
+    names = [f'event{i}' for i in range(numevents)]
+    ids = [model.addCustomEvent(name) for name in names]
+    for name in names[:-1]:
+        model.addTransition(0, [name], 0)
+    model.addTransition(0, [names[-1]], 1)
+    model.addTransition(1, [names[-1]], 0)
+    model._curState = 0
+    return model, names[-1], ids[-1]
+
+def timeEvents(model, last):
+    """ Time per processEvent call for no_event and for the worst-case event """
+
+    start = _now_us()
+    for i in range(ITERATIONS):
+        model.processEvent("no_event")
+    noevent = _elapsed_us(start) / ITERATIONS
+
+    start = _now_us()
+    for i in range(ITERATIONS):
+        model.processEvent(last)
+    lastevent = _elapsed_us(start) / ITERATIONS
+    return noevent, lastevent
+
+def bench(numevents):
+    model, last, lastid = buildModel(numevents)
+    noevent, lastevent = timeEvents(model, last)
+    basenoevent, baselast = timeEvents(*buildModel(numevents, BaselineModel)[:2])
+
+    start = _now_us()
+    for i in range(ITERATIONS):
+        model.processEventId(lastid)
+    lastid_us = _elapsed_us(start) / ITERATIONS
+
+    print(f"{numevents:4d} events:")
+    print(f"  baseline  no_event {basenoevent:8.2f} us   worst-case event {baselast:8.2f} us")
+    print(f"  now       no_event {noevent:8.2f} us   worst-case event {lastevent:8.2f} us   by id {lastid_us:8.2f} us")
+    print(f"  speedup   no_event {basenoevent / noevent:7.1f} x    worst-case event {baselast / lastevent:7.1f} x    by id {baselast / lastid_us:7.1f} x")
+
+if __name__ == "__main__":
+    for n in (3, 30, 300):
+        bench(n)
@@ -0,0 +1,161 @@
+"""
+# loadgen.py
+# Load generator for the sensor-readings endpoint. Simulates many warehouse
+# nodes, each posting a reading every few seconds over its own kept-alive
+# HTTP connection, the way NET does on the Pico. Meant to be pointed at
+# ords_standin.py (CPython 3.8+, no extra packages).
+#
+#   python3 tools/ords_standin.py &
+#   python3 tools/loadgen.py --nodes 300 --interval 2 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ISM6106-Group 4 MQ2"))
+from Payload import Payload
+
+class Results:
+    def __init__(self):
+        self.ok = 0
+        self.failed = 0
+        self.readings = 0
+        self.rejected = 0
+        self.latencies = []
+
+    def report(self, elapsed):
+        lat = sorted(self.latencies) or [0]
+        pct = lambda p: lat[min(len(lat) - 1, int(len(lat) * p))] * 1000
+        print(f"{self.ok + self.failed} requests in {elapsed:.1f} s ({(self.ok + self.failed) / elapsed:.1f} req/s, {self.readings / elapsed:.1f} readings stored/s)")
+        print(f"  ok {self.ok}  failed {self.failed}")
+        print(f"  readings stored {self.readings}  rejected in an ok bulk POST {self.rejected}")
+        print(f"  latency ms: p50 {pct(0.5):.1f}  p90 {pct(0.9):.1f}  p99 {pct(0.99):.1f}  max {lat[-1] * 1000:.1f}")
+
+def reading(node):
+    """ A reading like the ones buildPayload makes, for one of the three kinds of node """
+
+    ts = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    payload = {"timestamp": ts, "reading_ts": ts, "room_id": 100 + node % 50, "sensor_id": 200 + node,
+               "warehouse_id": 1 + node // 50}
+    for name in Payload.FIELDS[4:]:
+        payload[name] = None
+    kind = node % 3
+    if kind == 0:
+        payload["temperature"] = round(random.uniform(18, 32), 2)
+    elif kind == 1:
+        payload["humidity"] = round(random.uniform(35, 80), 1)
+    else:
+        payload["gas"] = round(random.uniform(0.1, 0.5), 4)
+        payload["hydrogen_ppm"] = round(random.uniform(1, 20), 3)
+        payload["lpg_ppm"] = round(random.uniform(1, 20), 3)
+        payload["methane_ppm"] = round(random.uniform(1, 40), 3)
+    return payload
+
+async def post(conn, host, path, body):
+    """ One POST on a kept connection, returns (status, body, connection) - reconnects if needed """
+
+    for attempt in range(2):
+        if conn is None:
+            conn = await asyncio.open_connection(host[0], host[1])
+        reader, writer = conn
+        try:
+            writer.write((f"POST {path} HTTP/1.1\r\nHost: {host[0]}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode() + body)
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("closed")
+            status = int(line.split()[1])
+            length, keep = 0, True
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode().partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+                elif name.lower() == 'connection':
+                    keep = value.strip().lower() != 'close'
+            reply = await reader.readexactly(length)
+            if not keep:
+                writer.close()
+                conn = None
+            return status, reply, conn
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            writer.close()
+            conn = None
+            if attempt == 1:
+                raise
+
+def stored_count(reply, sent):
+    """
+    How many readings of a bulk POST were stored. The endpoint answers with
+    {"results": [status, ...]}, one per reading - like DAL, a reply without
+    that list means the status of the whole POST counts for every reading.
+    """
+
+    try:
+        statuses = json.loads(reply)["results"]
+    except (ValueError, TypeError, KeyError):
+        return sent
+    if not isinstance(statuses, list):
+        return sent
+    return sum(1 for s in statuses[:sent] if isinstance(s, int) and s < 300)
+
+async def node(n, args, host, path, results, stop):
+    """ One simulated Pico posting every interval seconds (batched if --batch > 1) """
+
+    await asyncio.sleep(random.uniform(0, args.interval))   # spread the nodes out
+    conn = None
+    batch = []
+    while time.time() < stop:
+        batch.append(Payload.encode(reading(n), args.format))
+        if len(batch) >= args.batch:
+            body = json.dumps(batch if args.batch > 1 else batch[0]).encode()
+            start = time.time()
+            try:
+                status, reply, conn = await asyncio.wait_for(post(conn, host, path, body), args.timeout)
+            except (asyncio.TimeoutError, ConnectionError, OSError, asyncio.IncompleteReadError):
+                status, reply, conn = None, None, None
+            results.latencies.append(time.time() - start)
+            if status is not None and status < 300:
+                results.ok += 1
+                stored = stored_count(reply, len(batch)) if args.batch > 1 else 1
+                results.readings += stored
+                results.rejected += len(batch) - stored
+            else:
+                results.failed += 1
+            batch = []
+        await asyncio.sleep(args.interval)
+    if conn is not None:
+        conn[1].close()
+
+async def main(args):
+    proto, _, hostport, path = args.url.split('/', 3)
+    host = hostport.split(':')
+    host = (host[0], int(host[1]) if len(host) > 1 else 80)
+    path = '/' + path + ('/bulk' if args.batch > 1 else '')
+
+    results = Results()
+    start = time.time()
+    stop = start + args.duration
+    print(f"{args.nodes} nodes posting every {args.interval} s for {args.duration} s to {host[0]}:{host[1]}{path}")
+    await asyncio.gather(*[node(n, args, host, path, results, stop) for n in range(args.nodes)])
+    results.report(time.time() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate warehouse nodes posting sensor readings")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/ords/priscilallopes/api/sensor-readings")
+    parser.add_argument("--nodes", type=int, default=300)
+    parser.add_argument("--interval", type=float, default=10.0, help="seconds between readings per node")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--batch", type=int, default=1, help="readings per POST (uses the /bulk endpoint when > 1)")
+    parser.add_argument("--format", default="full", choices=Payload.FORMATS)
+    parser.add_argument("--timeout", type=float, default=15.0)
+    asyncio.run(main(parser.parse_args()))
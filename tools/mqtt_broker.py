@@ -0,0 +1,202 @@
+"""
+# mqtt_broker.py
+# A minimal MQTT 3.1.1 broker to run on a PC (CPython 3.8+, no extra
+# packages) for testing the MQTT transport of the DAL without a real
+# broker. Handles CONNECT (with persistent sessions), PUBLISH QoS 0/1,
+# SUBSCRIBE with + and # wildcards, PINGREQ and DISCONNECT.
+#
+#   python3 tools/mqtt_broker.py --port 1883 --db readings.sqlite
+#
+# With --db, every reading published under warehouse/... is decoded with
+# Payload.decode and stored like ords_standin.py does, so the same table
+# can be compared between the HTTP and MQTT paths. Not a real broker: no
+# QoS 2, no retained messages, no will, sessions only live in memory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import struct
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ISM6106-Group 4 MQ2"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from Payload import Payload
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 0x10, 0x20, 0x30, 0x40
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 0x80, 0x90, 0xC0, 0xD0, 0xE0
+
+def packet(kind, body=b''):
+    head = bytearray((kind,))
+    size = len(body)
+    while True:
+        b = size & 0x7F
+        size >>= 7
+        head.append(b | 0x80 if size else b)
+        if not size:
+            break
+    return bytes(head) + body
+
+def string(s):
+    s = s.encode()
+    return struct.pack('>H', len(s)) + s
+
+def matches(pattern, topic):
+    p, t = pattern.split('/'), topic.split('/')
+    for i in range(len(p)):
+        if p[i] == '#':
+            return True
+        if i >= len(t) or (p[i] != '+' and p[i] != t[i]):
+            return False
+    return len(p) == len(t)
+
+class Broker:
+    def __init__(self, args):
+        self.args = args
+        self.sessions = {}      # client id -> set of subscriptions (kept for persistent sessions)
+        self.clients = {}       # client id -> writer
+        self.seen = {}          # client id -> recently seen packet ids, to spot DUP resends
+        self.published = 0
+        self.duplicates = 0
+        self.store = None
+        if args.db:
+            from ords_standin import Store
+            self.store = Store(args.db)
+
+    async def handle(self, reader, writer):
+        client = None
+        try:
+            while True:
+                kind, flags, body = await self.read(reader)
+                if client is None and kind != CONNECT:
+                    # the first packet has to be CONNECT - drop clients that skip it
+                    print(f"packet type {kind >> 4} before CONNECT, closing the connection")
+                    break
+                if kind == CONNECT:
+                    client, clean = self.connect(body)
+                    present = 0 if clean or client not in self.sessions else 1
+                    if clean or client not in self.sessions:
+                        self.sessions[client] = set()
+                        self.seen[client] = []
+                    self.clients[client] = writer
+                    writer.write(packet(CONNACK, bytes((present, 0))))
+                elif kind == PUBLISH:
+                    await self.publish(client, flags, body, writer)
+                elif kind == SUBSCRIBE:
+                    pid = body[:2]
+                    pos, granted = 2, bytearray()
+                    while pos < len(body):
+                        size = struct.unpack('>H', body[pos:pos + 2])[0]
+                        self.sessions[client].add(body[pos + 2:pos + 2 + size].decode())
+                        pos += 3 + size
+                        granted.append(0)
+                    writer.write(packet(SUBACK, pid + bytes(granted)))
+                elif kind == PINGREQ:
+                    writer.write(packet(PINGRESP))
+                elif kind == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if client is not None and self.clients.get(client) is writer:
+                del self.clients[client]
+            writer.close()
+
+    def connect(self, body):
+        size = struct.unpack('>H', body[:2])[0]
+        flags = body[2 + size + 1]
+        pos = 2 + size + 4
+        size = struct.unpack('>H', body[pos:pos + 2])[0]
+        client = body[pos + 2:pos + 2 + size].decode()
+        print(f"client {client} connected ({'clean' if flags & 0x02 else 'persistent'} session)")
+        return client, bool(flags & 0x02)
+
+    async def publish(self, client, flags, body, writer):
+        qos = (flags >> 1) & 3
+        size = struct.unpack('>H', body[:2])[0]
+        topic = body[2:2 + size].decode()
+        pos = 2 + size
+        if qos:
+            pid = body[pos:pos + 2]
+            pos += 2
+        message = body[pos:]
+
+        if qos and random.random() < self.args.drop_rate:
+            # injected failure - swallow the message without a PUBACK, the client has to resend
+            return
+        if self.args.latency:
+            await asyncio.sleep(random.uniform(0, 2 * self.args.latency))
+
+        duplicate = False
+        if qos:
+            duplicate = flags & 0x08 and pid in self.seen[client]
+            self.seen[client] = (self.seen[client] + [pid])[-100:]
+            writer.write(packet(PUBACK, pid))
+        if duplicate:
+            self.duplicates += 1
+            return
+
+        self.published += 1
+        if self.store and topic.startswith("warehouse/"):
+            try:
+                data = json.loads(message)
+                readings = data if topic.endswith("/bulk") else [data]
+                for reading in readings:
+                    self.store.add(Payload.decode(reading))
+            except (ValueError, TypeError, AttributeError, IndexError, KeyError):
+                print(f"bad reading on {topic}: {message[:80]}")
+        out = packet(PUBLISH, string(topic) + message)
+        for other, subscriptions in self.sessions.items():
+            if other in self.clients and any(matches(s, topic) for s in subscriptions):
+                self.clients[other].write(out)
+
+    async def read(self, reader):
+        first = (await reader.readexactly(1))[0]
+        size, shift = 0, 0
+        while True:
+            b = (await reader.readexactly(1))[0]
+            size |= (b & 0x7F) << shift
+            shift += 7
+            if not b & 0x80:
+                break
+        return first & 0xF0, first & 0x0F, await reader.readexactly(size)
+
+    async def reporter(self, every):
+        last = (time.time(), 0)
+        while True:
+            await asyncio.sleep(every)
+            if self.store:
+                self.store.commit()
+            now = time.time()
+            print(f"{(self.published - last[1]) / (now - last[0]):8.1f} msg/s  total {self.published}, {self.duplicates} duplicates, {len(self.clients)} clients")
+            last = (now, self.published)
+
+async def main(args):
+    broker = Broker(args)
+    server = await asyncio.start_server(broker.handle, args.host, args.port)
+    print(f"MQTT broker stand-in on {args.host}:{args.port}")
+    asyncio.ensure_future(broker.reporter(args.report))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if broker.store:
+            broker.store.commit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimal MQTT broker stand-in")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--db", default=None, help="store warehouse/... readings in this SQLite file")
+    parser.add_argument("--latency", type=float, default=0.0, help="average delay before each PUBACK in seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of QoS 1 messages swallowed without a PUBACK")
+    parser.add_argument("--report", type=float, default=5.0)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,190 @@
+"""
+# ords_standin.py
+# A stand-in for the Oracle APEX ORDS sensor-readings endpoint, to run on
+# a PC (CPython 3.8+, no extra packages) so DAL/NET and the load generator
+# can be tested without the live server.
+#
+#   python3 tools/ords_standin.py --port 8080 --latency 0.05 --fail-rate 0.1
+#
+# Point the DAL at http://<pc address>:8080/ords/priscilallopes/api/sensor-readings
+#
+# Contract (same as DAL.buildPayload / the ORDS handler):
+#   POST .../sensor-readings        one reading as a JSON object -> 201
+#   POST .../sensor-readings/bulk   a JSON array of readings      -> 200 {"results": [status, ...]}
+# Readings can be in any of the Payload formats (full, compact, short, array).
+# Everything stored goes to the sensor_readings table in an SQLite file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ISM6106-Group 4 MQ2"))
+from Payload import Payload
+
+COLUMNS = Payload.FIELDS + ("reading_ts",)
+
+class Store:
+    """ SQLite table of readings. Inserts are committed in groups by flusher() """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS sensor_readings (id INTEGER PRIMARY KEY, received REAL, {', '.join(COLUMNS)})")
+        self.pending = []
+        self.total = 0
+
+    def add(self, reading):
+        self.pending.append((time.time(),) + tuple(reading[c] for c in COLUMNS))
+
+    def commit(self):
+        if self.pending:
+            self.db.executemany(f"INSERT INTO sensor_readings (received, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})", self.pending)
+            self.db.commit()
+            self.total += len(self.pending)
+            self.pending = []
+
+    async def flusher(self, every=0.5):
+        while True:
+            await asyncio.sleep(every)
+            self.commit()
+
+class Stats:
+    def __init__(self):
+        self.requests = 0
+        self.readings = 0
+        self.errors = 0
+        self.connections = 0
+
+    async def reporter(self, every):
+        last = (time.time(), 0, 0)
+        while True:
+            await asyncio.sleep(every)
+            now = time.time()
+            rps = (self.requests - last[1]) / (now - last[0])
+            readings = (self.readings - last[2]) / (now - last[0])
+            print(f"{rps:8.1f} req/s  {readings:8.1f} readings/s  total {self.requests} requests, {self.errors} injected errors, {self.connections} connections")
+            last = (now, self.requests, self.readings)
+
+class Server:
+    def __init__(self, args, store, stats):
+        self.args = args
+        self.store = store
+        self.stats = stats
+
+    async def handle(self, reader, writer):
+        """ One client connection - HTTP/1.1 with keep-alive """
+
+        self.stats.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, version = line.decode().split(None, 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                keep = version.strip() == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                status, reply = await self.respond(method, path, body)
+                if status is None:
+                    # injected dropped connection - no answer at all
+                    break
+                data = json.dumps(reply).encode()
+                writer.write((f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, path, body):
+        args = self.args
+        self.stats.requests += 1
+        if args.latency:
+            await asyncio.sleep(random.uniform(0, 2 * args.latency))
+
+        roll = random.random()
+        if roll < args.drop_rate:
+            self.stats.errors += 1
+            return None, None
+        if roll < args.drop_rate + args.fail_rate:
+            self.stats.errors += 1
+            return 503, {"error": "injected failure"}
+
+        path = path.split('?')[0].rstrip('/')
+        if method != 'POST' or not (path.endswith('/sensor-readings') or path.endswith('/sensor-readings/bulk')):
+            return 404, {"error": "not found"}
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400, {"error": "invalid JSON"}
+
+        if path.endswith('/bulk'):
+            if not isinstance(data, list):
+                return 400, {"error": "bulk body must be a JSON array"}
+            results = [self.store1(reading) for reading in data]
+            return 200, {"results": results}
+
+        status = self.store1(data)
+        return status, {"status": status}
+
+    def store1(self, reading):
+        """ Store one reading, returns its status (per-record failures are injected here too) """
+
+        if random.random() < self.args.record_fail_rate:
+            self.stats.errors += 1
+            return 503
+        try:
+            decoded = Payload.decode(reading)
+        except (ValueError, TypeError, AttributeError, IndexError):
+            return 400
+        if decoded["timestamp"] is None or decoded["room_id"] is None:
+            return 400
+        self.store.add(decoded)
+        self.stats.readings += 1
+        return 201
+
+async def main(args):
+    store = Store(args.db)
+    stats = Stats()
+    server = Server(args, store, stats)
+    listener = await asyncio.start_server(server.handle, args.host, args.port)
+    print(f"ORDS stand-in on http://{args.host}:{args.port}/ords/priscilallopes/api/sensor-readings  (db {args.db})")
+    asyncio.ensure_future(store.flusher())
+    asyncio.ensure_future(stats.reporter(args.report))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        store.commit()
+        print(f"{store.total} readings stored")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the ORDS sensor-readings endpoint")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--db", default="readings.sqlite")
+    parser.add_argument("--latency", type=float, default=0.0, help="average added latency per request in seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of requests where the connection is dropped")
+    parser.add_argument("--record-fail-rate", type=float, default=0.0, help="fraction of readings given a 503 inside a bulk reply")
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between throughput reports")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass